@@ -151,6 +151,7 @@ export default function ChapterAudioUpload({
             >
               <option value="stable-ts">Stable-TS (Default)</option>
               <option value="whisperx">WhisperX</option>
+              <option value="whisperx-align">WhisperX Align (known text)</option>
               <option value="auto">Auto (TTS timing)</option>
             </select>
           </div>
@@ -224,6 +225,7 @@ export default function ChapterAudioUpload({
               >
                 <option value="stable-ts">Stable-TS (Default)</option>
                 <option value="whisperx">WhisperX</option>
+                <option value="whisperx-align">WhisperX Align (known text)</option>
                 <option value="auto">Auto (TTS timing)</option>
               </select>
             </div>
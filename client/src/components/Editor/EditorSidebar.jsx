@@ -96,6 +96,7 @@ export default function EditorSidebar({
       >
         <option value="stable-ts">Stable-TS (Default)</option>
         <option value="whisperx">WhisperX</option>
+        <option value="whisperx-align">WhisperX Align (known text)</option>
         <option value="auto">Auto (TTS timing)</option>
       </select>
     </div>
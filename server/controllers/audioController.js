@@ -22,6 +22,7 @@ exports.uploadChapterAudio = async (req, res) => {
     const audioPath = path.join(audioDir, filename);
 
     await fs.writeFile(audioPath, req.file.buffer);
+    await removePcmCache(audioPath);
 
     // Get duration via ffprobe
     const duration = await getAudioDuration(audioPath);
@@ -120,6 +121,7 @@ exports.deleteChapterAudio = async (req, res) => {
 
     const filePath = path.join(book.storagePath, 'audio', info.filename);
     await fs.unlink(filePath).catch(() => {});
+    await removePcmCache(filePath);
     book.audioFiles.delete(chapterKey);
     book.markModified('audioFiles');
     await book.save();
@@ -208,6 +210,7 @@ exports.trimAudio = async (req, res) => {
     await trimWithFfmpeg(audioPath, keepRanges, trimmedPath);
     await fs.unlink(audioPath);
     await fs.rename(trimmedPath, audioPath);
+    await removePcmCache(audioPath);
 
     const newDuration = await getAudioDuration(audioPath);
 
@@ -274,6 +277,7 @@ exports.restoreAudio = async (req, res) => {
     }
 
     await fs.copyFile(backupPath, audioPath);
+    await removePcmCache(audioPath);
     const newDuration = await getAudioDuration(audioPath);
 
     const updatedInfo = { filename: audioInfo.filename, duration: newDuration, uploadedAt: audioInfo.uploadedAt };
@@ -440,6 +444,7 @@ exports.generateAudio = async (req, res) => {
 
     // Clean up temp file
     await fs.unlink(tmpTextPath).catch(() => {});
+    await removePcmCache(audioPath);
 
     const duration = await getAudioDuration(audioPath);
 
@@ -561,3 +566,19 @@ async function getAudioDuration(filePath) {
     return parseFloat(out) || 0;
   } catch { return 0; }
 }
+
+/**
+ * Delete the decoded-PCM caches the aligner keeps next to an audio file
+ * (chapter_1.mp3 -> chapter_1.pcm16k-<size>-<mtime>.npy, see
+ * scripts/voxalign/audio.py). Called whenever the audio is removed or replaced.
+ */
+async function removePcmCache(audioPath) {
+  const dir = path.dirname(audioPath);
+  const prefix = `${path.basename(audioPath, path.extname(audioPath))}.pcm16k-`;
+  const names = await fs.readdir(dir).catch(() => []);
+  await Promise.all(
+    names
+      .filter(name => name.startsWith(prefix) && name.endsWith('.npy'))
+      .map(name => fs.unlink(path.join(dir, name)).catch(() => {}))
+  );
+}
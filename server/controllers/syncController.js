@@ -7,20 +7,41 @@ const wordWrapper = require('../services/wordWrapper');
 const whisperxAligner = require('../services/whisperxAligner');
 const smilGenerator = require('../services/smilGenerator');
 
+/**
+ * Stored sync data for the chapter if it can seed an incremental
+ * re-alignment: it must come from one of `engines` (timings from another
+ * engine are not what the caller asked for) and be newer than the audio
+ * file (an upload, trim or restore after the sync invalidates its timings).
+ */
+async function previousAlignment(bookId, chapterIndex, syncLang, audioPath, engines) {
+  const previous = await SyncData.findOne({ bookId, chapterIndex: parseInt(chapterIndex), lang: syncLang });
+  if (!previous?.syncData?.length || !previous.updatedAt) return null;
+  if (!engines.includes(previous.engine)) return null;
+  const audioStat = await fs.stat(audioPath);
+  return audioStat.mtime <= previous.updatedAt ? previous : null;
+}
+
 /**
  * Auto-align audio to chapter text (SSE streaming).
  * POST /api/sync/:bookId/:chapterIndex/auto
  * Body: {
  *   mode: "word" | "sentence",
- *   engine: "auto" | "whisperx",
+ *   engine: "auto" | "whisperx" | "whisperx-align" | "stable-ts",
  *   modelSize: "tiny"|"base"|"small"|"medium"|"large-v2",
- *   lang?: string
+ *   lang?: string,
+ *   incremental?: boolean
  * }
  *
  * Engine behaviour:
  *   "auto"      — Use TTS timing if available, else WhisperX word-level
  *   "whisperx"  — Force WhisperX alignment (word-level forced alignment)
+ *   "whisperx-align" — WhisperX forced alignment of the known text, without Whisper transcription
  *   "stable-ts" — Use stable-ts (enhanced Whisper timestamps, best for fixing drift)
+ *
+ * In word mode, WhisperX re-aligns only the edited regions when the text
+ * changed since the last sync by the same engine, keeping the previous
+ * timings elsewhere (engine recorded as "whisperx[-align]-realign-word").
+ * incremental: false forces a full alignment.
  */
 exports.autoAlign = async (req, res) => {
   // Set up SSE headers
@@ -36,7 +57,7 @@ exports.autoAlign = async (req, res) => {
 
   try {
     const { bookId, chapterIndex } = req.params;
-    const { mode = 'word', engine = 'auto', modelSize = 'tiny', lang } = req.body;
+    const { mode = 'word', engine = 'auto', modelSize = 'tiny', lang, incremental = true } = req.body;
 
     send('progress', { step: 'preparing', message: 'Preparing chapter...' });
 
@@ -90,6 +111,7 @@ exports.autoAlign = async (req, res) => {
     send('progress', { step: 'wrapping_done', message: 'Text prepared. Starting alignment...' });
 
     const audioPath = path.join(book.storagePath, 'audio', audioInfo.filename);
+    const syncLang = (lang && lang !== bookLang) ? lang : null;
 
     const onProgress = (evt) => {
       send('progress', { step: evt.progress, message: evt.message });
@@ -118,7 +140,7 @@ exports.autoAlign = async (req, res) => {
       try {
         const timestamps = await whisperxAligner.alignWithStableTs(
           audioPath, wrapped.words,
-          { language: whisperLang, modelSize, onProgress }
+          { language: whisperLang, modelSize, onProgress, cacheDir: book.storagePath }
         );
         syncData = whisperxAligner.buildSyncData(timestamps, wrapped.wordIds);
         usedEngine = 'stable-ts';
@@ -130,23 +152,50 @@ exports.autoAlign = async (req, res) => {
     }
 
     // --- WhisperX alignment ---
-    if (!syncData && (engine === 'auto' || engine === 'whisperx')) {
+    if (!syncData && (engine === 'auto' || engine === 'whisperx' || engine === 'whisperx-align')) {
       send('progress', { step: 'whisperx_start', message: 'Starting WhisperX alignment...' });
 
+      const alignOnly = engine === 'whisperx-align';
+      const fullEngine = alignOnly ? `whisperx-align-${mode}` : `whisperx-${mode}`;
+      const realignEngine = alignOnly ? 'whisperx-align-realign-word' : 'whisperx-realign-word';
+      let realigned = false;
       try {
         if (mode === 'sentence') {
           syncData = await whisperxAligner.alignSentencesThenDistribute(
             audioPath, wrapped.plainText, wrapped.wordIds,
-            { language: whisperLang, modelSize, onProgress }
+            { language: whisperLang, modelSize, onProgress, cacheDir: book.storagePath, alignOnly }
           );
         } else {
-          const timestamps = await whisperxAligner.alignWords(
-            audioPath, wrapped.words,
-            { language: whisperLang, modelSize, onProgress }
-          );
+          let timestamps = null;
+          const previous = incremental
+            ? await previousAlignment(bookId, chapterIndex, syncLang, audioPath, [fullEngine, realignEngine])
+            : null;
+          const textChanged = previous && (previous.syncData.length !== wrapped.words.length
+            || previous.syncData.some((entry, i) => entry.word !== wrapped.words[i]));
+          if (textChanged) {
+            // Text edited since the last sync: re-align only around the changes
+            send('progress', { step: 'realign_start', message: 'Text changed, re-aligning edited regions...' });
+            try {
+              const result = await whisperxAligner.realignWords(
+                audioPath, previous.syncData, wrapped.words,
+                { language: whisperLang, modelSize, onProgress, cacheDir: book.storagePath, alignOnly }
+              );
+              timestamps = result.timestamps;
+              // Most of the text changed: the worker ran a full alignment instead
+              realigned = result.incremental;
+            } catch (err) {
+              console.error('Incremental re-alignment failed, running full alignment:', err.message);
+            }
+          }
+          if (!timestamps) {
+            timestamps = await whisperxAligner.alignWords(
+              audioPath, wrapped.words,
+              { language: whisperLang, modelSize, onProgress, cacheDir: book.storagePath, alignOnly }
+            );
+          }
           syncData = whisperxAligner.buildSyncData(timestamps, wrapped.wordIds);
         }
-        usedEngine = `whisperx-${mode}`;
+        usedEngine = realigned ? realignEngine : fullEngine;
       } catch (err) {
         console.error('WhisperX alignment failed:', err.message);
         send('error', { error: 'WhisperX alignment failed: ' + err.message });
@@ -171,7 +220,6 @@ exports.autoAlign = async (req, res) => {
     await fs.writeFile(path.join(smilDir, `chapter_${chapterIndex}.smil`), smilXml);
 
     // Save to database
-    const syncLang = (lang && lang !== bookLang) ? lang : null;
     await SyncData.findOneAndUpdate(
       { bookId, chapterIndex: parseInt(chapterIndex), lang: syncLang },
       {
@@ -183,6 +231,7 @@ exports.autoAlign = async (req, res) => {
         wordCount: wrapped.wordCount,
         duration: audioInfo.duration,
         status: 'complete',
+        updatedAt: new Date(),
       },
       { upsert: true, new: true }
     );
@@ -235,7 +284,7 @@ exports.saveManualSync = async (req, res) => {
     const syncLang = lang || null;
     await SyncData.findOneAndUpdate(
       { bookId, chapterIndex: parseInt(chapterIndex), lang: syncLang },
-      { syncData, lang: syncLang, engine: 'manual', status: 'complete', wordCount: syncData.length },
+      { syncData, lang: syncLang, engine: 'manual', status: 'complete', wordCount: syncData.length, updatedAt: new Date() },
       { upsert: true }
     );
 
@@ -17,6 +17,8 @@ const syncDataSchema = new mongoose.Schema({
     type: String,
     enum: [
       'whisperx-word', 'whisperx-sentence',
+      'whisperx-align-word', 'whisperx-align-sentence',
+      'whisperx-realign-word', 'whisperx-align-realign-word',
       'edge-tts-word-boundary',
       'stable-ts',
       'manual',
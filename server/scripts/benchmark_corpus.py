@@ -0,0 +1,81 @@
+"""
+Benchmark corpus shared by nllb_benchmark.py and voxalign_benchmark.py:
+paragraphs extracted from the EPUBs bundled with the repo, plus the
+comma-separated list type both command lines use.
+
+Usage:
+  from benchmark_corpus import DEFAULT_BOOKS, book_path, extract_paragraphs
+  paragraphs = extract_paragraphs(book_path("pg154.epub"))
+"""
+
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_BOOKS = ['pg154.epub', 'pg78045.epub', 'book.epub']
+
+# Same block elements translationService.translateChapterHtml translates
+TEXT_ELEMENTS = {
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'td', 'th',
+    'blockquote', 'figcaption', 'dt', 'dd',
+}
+
+
+class _ParagraphExtractor(HTMLParser):
+    """Collect the text of each top-level translatable block element."""
+
+    def __init__(self):
+        super().__init__()
+        self.paragraphs = []
+        self._depth = 0
+        self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in TEXT_ELEMENTS:
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in TEXT_ELEMENTS and self._depth:
+            self._depth -= 1
+            if not self._depth:
+                text = re.sub(r'\s+', ' ', ''.join(self._buf)).strip()
+                if text:
+                    self.paragraphs.append(text)
+                self._buf = []
+
+    def handle_data(self, data):
+        if self._depth:
+            self._buf.append(data)
+
+
+def extract_paragraphs(epub_path):
+    """Return the paragraphs of an EPUB in spine order."""
+    with zipfile.ZipFile(epub_path) as z:
+        container = ET.fromstring(z.read('META-INF/container.xml'))
+        rootfile = container.find('.//{*}rootfile').get('full-path')
+        opf = ET.fromstring(z.read(rootfile))
+        base = os.path.dirname(rootfile)
+
+        manifest = {item.get('id'): item.get('href') for item in opf.iterfind('.//{*}manifest/{*}item')}
+        paragraphs = []
+        for itemref in opf.iterfind('.//{*}spine/{*}itemref'):
+            href = manifest.get(itemref.get('idref'))
+            if not href:
+                continue
+            parser = _ParagraphExtractor()
+            parser.feed(z.read(os.path.join(base, href).replace(os.sep, '/')).decode('utf-8', 'replace'))
+            paragraphs.extend(parser.paragraphs)
+        return paragraphs
+
+
+def book_path(book):
+    """EPUB path; relative names are taken from the repo root."""
+    return book if os.path.isabs(book) else os.path.join(REPO_ROOT, book)
+
+
+def csv_list(cast):
+    """argparse type for a comma-separated list, e.g. csv_list(int) for "1,4,8"."""
+    return lambda value: [cast(v) for v in value.split(',') if v.strip()]
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Translation throughput benchmark for nllb_translate.py.
+
+Extracts paragraphs from the EPUBs bundled with the repo (pg154.epub,
+pg78045.epub, book.epub) and translates them under every combination of
+the requested backends, batch sizes, thread counts and worker counts.
+Each configuration runs in a fresh process so model-load time and peak
+RSS are measured in isolation.
+
+Usage:
+  python nllb_benchmark.py --backends torch,ctranslate2 --batch-tokens 1024,4096 --threads 4 --workers 1,4
+
+  Offline / CI (tiny random-weight model, no 1.2GB download):
+    python nllb_benchmark.py --tiny --max-paragraphs 50
+
+Output (JSON, stdout or --output):
+  {
+    "paragraphs": 300,
+    "books": { "pg154.epub": 100, ... },
+    "results": [
+      { "backend": "torch", "batch_tokens": 2048, "threads": 4, "workers": 1,
+        "model_load_s": 7.9, "elapsed_s": 41.2, "paragraphs_per_sec": 7.3,
+        "tokens_per_sec": 402.1, "latency_p50_s": 20.3, "latency_p95_s": 38.8,
+        "peak_rss_mb": 2710.4, "peak_worker_rss_mb": 0.0, ... },
+      ...
+    ]
+  }
+
+Latency is the time from the start of the run until a paragraph's
+translation is complete, i.e. what a reader of the streamed output waits.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import nllb_translate
+from benchmark_corpus import DEFAULT_BOOKS, book_path, csv_list, extract_paragraphs
+
+
+class TinyTokenizer:
+    """
+    Offline stand-in for the NLLB tokenizer: words are hashed into a small
+    vocabulary and NLLB language codes get their own ids. Implements only
+    what nllb_translate's torch path uses.
+    """
+
+    pad_token_id = 1
+    eos_token_id = 2
+    unk_token_id = 3
+
+    def __init__(self, lang_codes, vocab_size=8192):
+        self.src_lang = lang_codes[0]
+        self.lang_ids = {code: 4 + i for i, code in enumerate(lang_codes)}
+        self.word_base = 4 + len(lang_codes)
+        self.vocab_size = vocab_size
+
+    def __len__(self):
+        return self.vocab_size
+
+    def _encode(self, text):
+        span = self.vocab_size - self.word_base
+        return [self.word_base + zlib.crc32(w.encode('utf-8')) % span for w in text.split()]
+
+    def __call__(self, texts, add_special_tokens=True, **kwargs):
+        ids = [self._encode(t) for t in texts]
+        if add_special_tokens:
+            ids = [self.build_inputs_with_special_tokens(i) for i in ids]
+        return {"input_ids": ids}
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [self.lang_ids.get(self.src_lang, self.unk_token_id)] + list(ids) + [self.eos_token_id]
+
+    def pad(self, encoded, return_tensors=None, **kwargs):
+        import torch
+        rows = encoded["input_ids"]
+        width = max(len(r) for r in rows)
+        return {
+            "input_ids": torch.tensor([r + [self.pad_token_id] * (width - len(r)) for r in rows]),
+            "attention_mask": torch.tensor([[1] * len(r) + [0] * (width - len(r)) for r in rows]),
+        }
+
+    def convert_tokens_to_ids(self, token):
+        return self.lang_ids.get(token, self.unk_token_id)
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return [
+            ' '.join(f"t{int(i)}" for i in seq if int(i) >= self.word_base)
+            for seq in sequences
+        ]
+
+
+def load_tiny_model(src_lang, tgt_lang, backend='torch'):
+    """Random-weight 2-layer M2M100 (NLLB architecture) with a TinyTokenizer."""
+    import torch
+    from transformers import M2M100Config, M2M100ForConditionalGeneration
+
+    if backend == 'ctranslate2':
+        raise ValueError("--tiny supports the torch and torch-int8 backends only")
+
+    tokenizer = TinyTokenizer([src_lang, tgt_lang])
+    torch.manual_seed(0)
+    config = M2M100Config(
+        vocab_size=len(tokenizer), d_model=64,
+        encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=2, decoder_attention_heads=2,
+        encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_position_embeddings=1024,
+        pad_token_id=tokenizer.pad_token_id, eos_token_id=tokenizer.eos_token_id,
+        bos_token_id=0, decoder_start_token_id=tokenizer.eos_token_id,
+    )
+    model = M2M100ForConditionalGeneration(config)
+    if backend == 'torch-int8':
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model.eval()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size in MB of this process, or of its largest
+    finished child process (0 where the resource module is unavailable).
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(usage / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_config(config, paragraphs):
+    """Benchmark one configuration in the current process; return its metrics."""
+    src_nllb = nllb_translate.get_nllb_code(config['src'])
+    tgt_nllb = nllb_translate.get_nllb_code(config['tgt'])
+
+    t0 = time.perf_counter()
+    if config['tiny']:
+        tokenizer, model = load_tiny_model(src_nllb, tgt_nllb, config['backend'])
+    else:
+        tokenizer, model = nllb_translate.load_model(backend=config['backend'], ct2_dir=config.get('ct2_model'))
+    model_load_s = time.perf_counter() - t0
+
+    pool = None
+    if config['workers'] > 1:
+        pool = nllb_translate.create_pool(
+            tokenizer, model, config['workers'], config['threads'],
+            backend=config['backend'], ct2_dir=config.get('ct2_model'),
+        )
+    else:
+        nllb_translate.set_threads(model, config['threads'])
+
+    done_at = {}
+    start = time.perf_counter()
+    try:
+        _, stats = nllb_translate.translate_paragraphs_multi(
+            paragraphs, tokenizer, model, src_nllb, [tgt_nllb],
+            batch_tokens=config['batch_tokens'],
+            decoding=nllb_translate.resolve_decoding(config),
+            on_paragraph=lambda _tgt, idx, _text: done_at.__setitem__(idx, time.perf_counter() - start),
+            pool=pool,
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    latencies = list(done_at.values())
+    return {
+        **{k: config[k] for k in ('backend', 'batch_tokens', 'threads', 'workers', 'preset')},
+        "model_load_s": round(model_load_s, 3),
+        "elapsed_s": round(elapsed, 3),
+        "paragraphs_per_sec": round(len(paragraphs) / elapsed, 3) if elapsed else 0.0,
+        "tokens_per_sec": round(stats["real_tokens"] / elapsed, 1) if elapsed else 0.0,
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_rss_mb(children=True),
+        "chunks": stats["chunks"],
+        "unique_chunks": stats["unique_chunks"],
+        "padding_efficiency": stats["padding_efficiency"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark NLLB translation throughput')
+    parser.add_argument('--books', type=csv_list(str), default=DEFAULT_BOOKS,
+                        help='EPUB files (relative to the repo root) to take paragraphs from')
+    parser.add_argument('--max-paragraphs', type=int, default=100, help='Paragraphs taken from each book')
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='fr')
+    parser.add_argument('--backends', type=csv_list(str), default=['torch'],
+                        help=f"Comma-separated subset of: {', '.join(nllb_translate.BACKENDS)}")
+    parser.add_argument('--batch-tokens', type=csv_list(int), default=[nllb_translate.DEFAULT_BATCH_TOKENS])
+    parser.add_argument('--threads', type=csv_list(int), default=[os.cpu_count() or 1])
+    parser.add_argument('--workers', type=csv_list(int), default=[1])
+    parser.add_argument('--preset', choices=list(nllb_translate.DECODING_PRESETS), default='default')
+    parser.add_argument('--ct2-model', help='Converted CTranslate2 model directory')
+    parser.add_argument('--tiny', action='store_true',
+                        help='Use a tiny random-weight model and hashed tokenizer (offline, no download)')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        # Child process: one configuration, paragraphs read from the given file
+        config = json.loads(args.run_one)
+        with open(config['paragraphs_path'], 'r', encoding='utf-8') as f:
+            paragraphs = json.load(f)
+        print(json.dumps(run_config(config, paragraphs)))
+        return
+
+    paragraphs = []
+    books = {}
+    for book in args.books:
+        extracted = extract_paragraphs(book_path(book))[:args.max_paragraphs]
+        books[os.path.basename(book)] = len(extracted)
+        paragraphs.extend(extracted)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(paragraphs, f, ensure_ascii=False)
+        paragraphs_path = f.name
+
+    results = []
+    try:
+        for backend, batch_tokens, threads, workers in itertools.product(
+                args.backends, args.batch_tokens, args.threads, args.workers):
+            config = {
+                'backend': backend, 'batch_tokens': batch_tokens, 'threads': threads,
+                'workers': workers, 'preset': args.preset, 'tiny': args.tiny,
+                'src': args.src, 'tgt': args.tgt, 'ct2_model': args.ct2_model,
+                'paragraphs_path': paragraphs_path,
+            }
+            print(f"BENCH:{backend} batch_tokens={batch_tokens} threads={threads} workers={workers}",
+                  file=sys.stderr, flush=True)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run-one', json.dumps(config)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                failed = {k: v for k, v in config.items() if k != 'paragraphs_path'}
+                results.append({**failed, "error": proc.stderr.strip()[-500:]})
+                continue
+            results.append(json.loads(proc.stdout.strip().split('\n')[-1]))
+    finally:
+        os.unlink(paragraphs_path)
+
+    report = json.dumps({
+        "paragraphs": len(paragraphs),
+        "books": books,
+        "tiny": args.tiny,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,202 +10,1084 @@ Supports two modes:
   Multiple paragraphs (JSON array):
     python nllb_translate.py --input paras.json --output out.json --src en --tgt ja --json
 
+  Several targets in one run (source encoded once, one output per target):
+    python nllb_translate.py --input paras.json --output out_{tgt}.json --src en --tgt ja,es,fr --json
+
+  Streaming NDJSON output that survives restarts (--resume skips finished indices):
+    python nllb_translate.py --input paras.json --output out.ndjson --src en --tgt ja --json --stream --resume
+
+  Up to 8 batches at once with 4 threads each, on one copy of the weights:
+    python nllb_translate.py --input paras.json --output out.json --src en --tgt ja --json --workers 8 --threads 4
+
+  Persistent worker (model loaded once, one JSON job per stdin line):
+    python nllb_translate.py --serve
+    {"id": 1, "input": "paras.json", "output": "out.json", "src": "en", "tgt": "ja", "json": true}
+
 The model is downloaded on first run (~1.2GB) and cached locally.
+On CPU, --backend ctranslate2 (or torch-int8) runs an int8-quantized copy
+of the same model, several times faster and with a fraction of the memory.
 """
 
 import argparse
+import math
+import os
+import re
 import sys
 import json
 
+from translation_memory import TranslationMemory, DEFAULT_MAX_BYTES
+
+MODEL_NAME = "facebook/nllb-200-distilled-600M"
+DEFAULT_BATCH_TOKENS = 2048
+
+# Decoding presets. num_beams=None keeps the model's own generation config.
+# With max_len_ratio set, output is capped at max_len_ratio x source tokens
+# + max_len_offset; without it, at max_length like a plain generate call.
+DECODING_PRESETS = {
+    'default': {'num_beams': None, 'length_penalty': None, 'max_len_ratio': None, 'max_len_offset': None},
+    'fast': {'num_beams': 1, 'length_penalty': None, 'max_len_ratio': 1.3, 'max_len_offset': 5},
+    'quality': {'num_beams': 5, 'length_penalty': 1.0, 'max_len_ratio': None, 'max_len_offset': None},
+}
+
+# Fills in the other half of a proportional cap when only one is given
+PROPORTIONAL_CAP = {'max_len_ratio': 1.5, 'max_len_offset': 10}
+
+
+# ISO 639-1 / locale codes -> NLLB flores-200 codes
+NLLB_CODES = {
+    # Common mappings: ISO 639-1 -> NLLB
+    'en': 'eng_Latn', 'en-US': 'eng_Latn', 'en-GB': 'eng_Latn', 'en-AU': 'eng_Latn', 'en-IN': 'eng_Latn',
+    'es': 'spa_Latn', 'es-ES': 'spa_Latn', 'es-MX': 'spa_Latn', 'es-AR': 'spa_Latn',
+    'fr': 'fra_Latn', 'fr-FR': 'fra_Latn', 'fr-CA': 'fra_Latn',
+    'de': 'deu_Latn', 'de-DE': 'deu_Latn', 'de-AT': 'deu_Latn', 'de-CH': 'deu_Latn',
+    'it': 'ita_Latn', 'it-IT': 'ita_Latn',
+    'pt': 'por_Latn', 'pt-BR': 'por_Latn', 'pt-PT': 'por_Latn',
+    'nl': 'nld_Latn', 'nl-NL': 'nld_Latn', 'nl-BE': 'nld_Latn',
+    'ru': 'rus_Cyrl', 'ru-RU': 'rus_Cyrl',
+    'pl': 'pol_Latn', 'pl-PL': 'pol_Latn',
+    'uk': 'ukr_Cyrl', 'uk-UA': 'ukr_Cyrl',
+    'cs': 'ces_Latn', 'cs-CZ': 'ces_Latn',
+    'ro': 'ron_Latn', 'ro-RO': 'ron_Latn',
+    'hu': 'hun_Latn', 'hu-HU': 'hun_Latn',
+    'sv': 'swe_Latn', 'sv-SE': 'swe_Latn',
+    'da': 'dan_Latn', 'da-DK': 'dan_Latn',
+    'fi': 'fin_Latn', 'fi-FI': 'fin_Latn',
+    'nb': 'nob_Latn', 'nb-NO': 'nob_Latn', 'no': 'nob_Latn',
+    'el': 'ell_Grek', 'el-GR': 'ell_Grek',
+    'bg': 'bul_Cyrl', 'bg-BG': 'bul_Cyrl',
+    'hr': 'hrv_Latn', 'hr-HR': 'hrv_Latn',
+    'sk': 'slk_Latn', 'sk-SK': 'slk_Latn',
+    'sl': 'slv_Latn', 'sl-SI': 'slv_Latn',
+    'sr': 'srp_Cyrl', 'sr-RS': 'srp_Cyrl',
+    'lt': 'lit_Latn', 'lt-LT': 'lit_Latn',
+    'lv': 'lav_Latn', 'lv-LV': 'lav_Latn',
+    'et': 'est_Latn', 'et-EE': 'est_Latn',
+    'hi': 'hin_Deva', 'hi-IN': 'hin_Deva',
+    'bn': 'ben_Beng', 'bn-IN': 'ben_Beng', 'bn-BD': 'ben_Beng',
+    'ta': 'tam_Taml', 'ta-IN': 'tam_Taml',
+    'te': 'tel_Telu', 'te-IN': 'tel_Telu',
+    'mr': 'mar_Deva', 'mr-IN': 'mar_Deva',
+    'gu': 'guj_Gujr', 'gu-IN': 'guj_Gujr',
+    'pa': 'pan_Guru', 'pa-IN': 'pan_Guru',
+    'kn': 'kan_Knda', 'kn-IN': 'kan_Knda',
+    'ml': 'mal_Mlym', 'ml-IN': 'mal_Mlym',
+    'ur': 'urd_Arab', 'ur-PK': 'urd_Arab', 'ur-IN': 'urd_Arab',
+    'ar': 'arb_Arab', 'ar-SA': 'arb_Arab', 'ar-AE': 'arb_Arab', 'ar-EG': 'arb_Arab',
+    'fa': 'pes_Arab', 'fa-IR': 'pes_Arab',
+    'he': 'heb_Hebr', 'he-IL': 'heb_Hebr',
+    'tr': 'tur_Latn', 'tr-TR': 'tur_Latn',
+    'ja': 'jpn_Jpan', 'ja-JP': 'jpn_Jpan',
+    'ko': 'kor_Hang', 'ko-KR': 'kor_Hang',
+    'zh': 'zho_Hans', 'zh-CN': 'zho_Hans', 'zh-TW': 'zho_Hant', 'zh-HK': 'zho_Hant',
+    'zh-Hans': 'zho_Hans', 'zh-Hant': 'zho_Hant',
+    'th': 'tha_Thai', 'th-TH': 'tha_Thai',
+    'vi': 'vie_Latn', 'vi-VN': 'vie_Latn',
+    'id': 'ind_Latn', 'id-ID': 'ind_Latn',
+    'ms': 'zsm_Latn', 'ms-MY': 'zsm_Latn',
+    'tl': 'tgl_Latn', 'fil': 'tgl_Latn', 'fil-PH': 'tgl_Latn',
+    'sw': 'swh_Latn', 'sw-KE': 'swh_Latn',
+    'af': 'afr_Latn', 'af-ZA': 'afr_Latn',
+    'am': 'amh_Ethi', 'am-ET': 'amh_Ethi',
+    'my': 'mya_Mymr', 'my-MM': 'mya_Mymr',
+    'km': 'khm_Khmr', 'km-KH': 'khm_Khmr',
+    'lo': 'lao_Laoo', 'lo-LA': 'lao_Laoo',
+    'ne': 'npi_Deva', 'ne-NP': 'npi_Deva',
+    'si': 'sin_Sinh', 'si-LK': 'sin_Sinh',
+    'ka': 'kat_Geor', 'ka-GE': 'kat_Geor',
+    'az': 'azj_Latn', 'az-AZ': 'azj_Latn',
+    'uz': 'uzn_Latn', 'uz-UZ': 'uzn_Latn',
+    'kk': 'kaz_Cyrl', 'kk-KZ': 'kaz_Cyrl',
+    'mn': 'khk_Cyrl', 'mn-MN': 'khk_Cyrl',
+    'cy': 'cym_Latn', 'cy-GB': 'cym_Latn',
+    'ga': 'gle_Latn', 'ga-IE': 'gle_Latn',
+    'mt': 'mlt_Latn', 'mt-MT': 'mlt_Latn',
+    'is': 'isl_Latn', 'is-IS': 'isl_Latn',
+    'mk': 'mkd_Cyrl', 'mk-MK': 'mkd_Cyrl',
+    'sq': 'als_Latn', 'sq-AL': 'als_Latn',
+    'bs': 'bos_Latn', 'bs-BA': 'bos_Latn',
+    'gl': 'glg_Latn', 'gl-ES': 'glg_Latn',
+    'ca': 'cat_Latn', 'ca-ES': 'cat_Latn',
+    'eu': 'eus_Latn', 'eu-ES': 'eus_Latn',
+}
+
+# Case-insensitive view of NLLB_CODES, built once at import
+_NLLB_LOOKUP = {code.lower(): nllb for code, nllb in NLLB_CODES.items()}
+
+NLLB_CODE_PATTERN = re.compile(r'^[a-z]{3}_[A-Z][a-z]{3}$')
+
 
 def get_nllb_code(lang_code):
-    """Map ISO 639-1 / locale codes to NLLB flores-200 codes."""
-    mapping = {
-        # Common mappings: ISO 639-1 -> NLLB
-        'en': 'eng_Latn', 'en-US': 'eng_Latn', 'en-GB': 'eng_Latn', 'en-AU': 'eng_Latn', 'en-IN': 'eng_Latn',
-        'es': 'spa_Latn', 'es-ES': 'spa_Latn', 'es-MX': 'spa_Latn', 'es-AR': 'spa_Latn',
-        'fr': 'fra_Latn', 'fr-FR': 'fra_Latn', 'fr-CA': 'fra_Latn',
-        'de': 'deu_Latn', 'de-DE': 'deu_Latn', 'de-AT': 'deu_Latn', 'de-CH': 'deu_Latn',
-        'it': 'ita_Latn', 'it-IT': 'ita_Latn',
-        'pt': 'por_Latn', 'pt-BR': 'por_Latn', 'pt-PT': 'por_Latn',
-        'nl': 'nld_Latn', 'nl-NL': 'nld_Latn', 'nl-BE': 'nld_Latn',
-        'ru': 'rus_Cyrl', 'ru-RU': 'rus_Cyrl',
-        'pl': 'pol_Latn', 'pl-PL': 'pol_Latn',
-        'uk': 'ukr_Cyrl', 'uk-UA': 'ukr_Cyrl',
-        'cs': 'ces_Latn', 'cs-CZ': 'ces_Latn',
-        'ro': 'ron_Latn', 'ro-RO': 'ron_Latn',
-        'hu': 'hun_Latn', 'hu-HU': 'hun_Latn',
-        'sv': 'swe_Latn', 'sv-SE': 'swe_Latn',
-        'da': 'dan_Latn', 'da-DK': 'dan_Latn',
-        'fi': 'fin_Latn', 'fi-FI': 'fin_Latn',
-        'nb': 'nob_Latn', 'nb-NO': 'nob_Latn', 'no': 'nob_Latn',
-        'el': 'ell_Grek', 'el-GR': 'ell_Grek',
-        'bg': 'bul_Cyrl', 'bg-BG': 'bul_Cyrl',
-        'hr': 'hrv_Latn', 'hr-HR': 'hrv_Latn',
-        'sk': 'slk_Latn', 'sk-SK': 'slk_Latn',
-        'sl': 'slv_Latn', 'sl-SI': 'slv_Latn',
-        'sr': 'srp_Cyrl', 'sr-RS': 'srp_Cyrl',
-        'lt': 'lit_Latn', 'lt-LT': 'lit_Latn',
-        'lv': 'lav_Latn', 'lv-LV': 'lav_Latn',
-        'et': 'est_Latn', 'et-EE': 'est_Latn',
-        'hi': 'hin_Deva', 'hi-IN': 'hin_Deva',
-        'bn': 'ben_Beng', 'bn-IN': 'ben_Beng', 'bn-BD': 'ben_Beng',
-        'ta': 'tam_Taml', 'ta-IN': 'tam_Taml',
-        'te': 'tel_Telu', 'te-IN': 'tel_Telu',
-        'mr': 'mar_Deva', 'mr-IN': 'mar_Deva',
-        'gu': 'guj_Gujr', 'gu-IN': 'guj_Gujr',
-        'pa': 'pan_Guru', 'pa-IN': 'pan_Guru',
-        'kn': 'kan_Knda', 'kn-IN': 'kan_Knda',
-        'ml': 'mal_Mlym', 'ml-IN': 'mal_Mlym',
-        'ur': 'urd_Arab', 'ur-PK': 'urd_Arab', 'ur-IN': 'urd_Arab',
-        'ar': 'arb_Arab', 'ar-SA': 'arb_Arab', 'ar-AE': 'arb_Arab', 'ar-EG': 'arb_Arab',
-        'fa': 'pes_Arab', 'fa-IR': 'pes_Arab',
-        'he': 'heb_Hebr', 'he-IL': 'heb_Hebr',
-        'tr': 'tur_Latn', 'tr-TR': 'tur_Latn',
-        'ja': 'jpn_Jpan', 'ja-JP': 'jpn_Jpan',
-        'ko': 'kor_Hang', 'ko-KR': 'kor_Hang',
-        'zh': 'zho_Hans', 'zh-CN': 'zho_Hans', 'zh-TW': 'zho_Hant', 'zh-HK': 'zho_Hant',
-        'th': 'tha_Thai', 'th-TH': 'tha_Thai',
-        'vi': 'vie_Latn', 'vi-VN': 'vie_Latn',
-        'id': 'ind_Latn', 'id-ID': 'ind_Latn',
-        'ms': 'zsm_Latn', 'ms-MY': 'zsm_Latn',
-        'tl': 'tgl_Latn', 'fil': 'tgl_Latn', 'fil-PH': 'tgl_Latn',
-        'sw': 'swh_Latn', 'sw-KE': 'swh_Latn',
-        'af': 'afr_Latn', 'af-ZA': 'afr_Latn',
-        'am': 'amh_Ethi', 'am-ET': 'amh_Ethi',
-        'my': 'mya_Mymr', 'my-MM': 'mya_Mymr',
-        'km': 'khm_Khmr', 'km-KH': 'khm_Khmr',
-        'lo': 'lao_Laoo', 'lo-LA': 'lao_Laoo',
-        'ne': 'npi_Deva', 'ne-NP': 'npi_Deva',
-        'si': 'sin_Sinh', 'si-LK': 'sin_Sinh',
-        'ka': 'kat_Geor', 'ka-GE': 'kat_Geor',
-        'az': 'azj_Latn', 'az-AZ': 'azj_Latn',
-        'uz': 'uzn_Latn', 'uz-UZ': 'uzn_Latn',
-        'kk': 'kaz_Cyrl', 'kk-KZ': 'kaz_Cyrl',
-        'mn': 'khk_Cyrl', 'mn-MN': 'khk_Cyrl',
-        'cy': 'cym_Latn', 'cy-GB': 'cym_Latn',
-        'ga': 'gle_Latn', 'ga-IE': 'gle_Latn',
-        'mt': 'mlt_Latn', 'mt-MT': 'mlt_Latn',
-        'is': 'isl_Latn', 'is-IS': 'isl_Latn',
-        'mk': 'mkd_Cyrl', 'mk-MK': 'mkd_Cyrl',
-        'sq': 'als_Latn', 'sq-AL': 'als_Latn',
-        'bs': 'bos_Latn', 'bs-BA': 'bos_Latn',
-        'gl': 'glg_Latn', 'gl-ES': 'glg_Latn',
-        'ca': 'cat_Latn', 'ca-ES': 'cat_Latn',
-        'eu': 'eus_Latn', 'eu-ES': 'eus_Latn',
+    """
+    Map ISO 639-1 / locale codes to NLLB flores-200 codes.
+
+    Codes are normalized (case, "_" vs "-") and fall back to shorter
+    locales, so "pt_br" -> "pt-BR" -> "pt". NLLB codes such as "jpn_Jpan"
+    pass through; anything unknown is returned unchanged for
+    validate_lang_codes to reject.
+    """
+    code = lang_code.strip()
+    if NLLB_CODE_PATTERN.match(code):
+        return code
+
+    parts = code.replace('_', '-').lower().split('-')
+    while parts:
+        nllb = _NLLB_LOOKUP.get('-'.join(parts))
+        if nllb:
+            return nllb
+        parts.pop()
+    return code
+
+
+def language_tokens(tokenizer):
+    """
+    The tokenizer's language tokens ("eng_Latn", ...): lang_code_to_id on
+    older transformers releases, the flores-200 entries of
+    additional_special_tokens on newer ones.
+    """
+    tokens = set(getattr(tokenizer, 'lang_code_to_id', None) or ())
+    tokens.update(t for t in getattr(tokenizer, 'additional_special_tokens', None) or ()
+                  if NLLB_CODE_PATTERN.match(t))
+    return tokens
+
+
+def validate_lang_codes(codes, tokenizer):
+    """
+    Raise ValueError unless every NLLB code is one of the tokenizer's
+    language tokens. convert_tokens_to_ids silently maps unknown codes to
+    <unk>, and ordinary vocabulary pieces ("ab", "xx") to a valid id, either
+    of which would otherwise yield garbled output after a full run.
+    """
+    known = language_tokens(tokenizer)
+    unk = tokenizer.unk_token_id
+    bad = [
+        c for c in codes
+        if (c not in known if known else not NLLB_CODE_PATTERN.match(c))
+        or tokenizer.convert_tokens_to_ids(c) in (None, unk)
+    ]
+    if bad:
+        raise ValueError(f"Unsupported language code(s): {', '.join(bad)}")
+
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def chunk_paragraphs(paragraphs, tokenizer, max_length=512):
+    """
+    Split paragraphs into sentence chunks that fit max_length tokens.
+
+    Every sentence of every paragraph is tokenized exactly once, in a single
+    batch-encode call (the fast tokenizer's parallel path). Chunks keep
+    their token ids, so model inputs are assembled from them directly
+    instead of tokenizing the text again. tokenizer.src_lang must be set.
+
+    Returns, per paragraph, a list of (chunk_text, chunk_ids) where
+    chunk_ids are the content ids without language/EOS special tokens.
+    """
+    sentences = []
+    for para in paragraphs:
+        text = (para or '').strip()
+        sentences.append(SENTENCE_BOUNDARY.split(text) if text else [])
+
+    flat = [s for sents in sentences for s in sents]
+    encoded = iter(tokenizer(flat, add_special_tokens=False)["input_ids"] if flat else [])
+
+    # Room left for the special tokens added by build_inputs_with_special_tokens;
+    # a single sentence longer than that is cut at max_length - 2 ids
+    budget = max_length - 10
+    limit = max_length - 2
+    result = []
+    for sents in sentences:
+        chunks = []
+        current_chunk = []
+        current_ids = []
+        for s in sents:
+            s_ids = next(encoded)
+            if len(current_ids) + len(s_ids) > budget and current_chunk:
+                chunks.append((' '.join(current_chunk), current_ids[:limit]))
+                current_chunk = [s]
+                current_ids = list(s_ids)
+            else:
+                current_chunk.append(s)
+                current_ids.extend(s_ids)
+        if current_chunk:
+            chunks.append((' '.join(current_chunk), current_ids[:limit]))
+        result.append(chunks)
+    return result
+
+
+def make_batches(lengths, batch_tokens, sort_by_length=True):
+    """
+    Group chunk indices into batches whose padded size
+    (longest chunk x batch size) stays within batch_tokens.
+    A chunk longer than the budget gets a batch of its own.
+
+    With sort_by_length, chunks are scheduled longest-first so each batch
+    holds chunks of similar length and little of it is padding. Callers
+    scatter results back by index, so the original order is unaffected.
+    """
+    order = range(len(lengths))
+    if sort_by_length:
+        order = sorted(order, key=lambda i: -lengths[i])
+
+    batches = []
+    current = []
+    current_max = 0
+    for idx in order:
+        n_tokens = lengths[idx]
+        new_max = max(current_max, n_tokens)
+        if current and new_max * (len(current) + 1) > batch_tokens:
+            batches.append(current)
+            current = []
+            new_max = n_tokens
+        current.append(idx)
+        current_max = new_max
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padding_stats(batches, lengths):
+    """Summarize how much of the padded batch area is real tokens."""
+    real = sum(lengths[i] for b in batches for i in b)
+    padded = sum(max(lengths[i] for i in b) * len(b) for b in batches)
+    return {
+        "batches": len(batches),
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "padding_efficiency": round(real / padded, 4) if padded else 1.0,
     }
-    return mapping.get(lang_code, lang_code)
 
 
-def translate_one(text, tokenizer, model, src_lang, tgt_lang, max_length=512):
-    """Translate a single paragraph. Splits into sentence chunks if too long."""
-    import re
-
-    text = text.strip()
-    if not text:
-        return ''
-
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-
-    # Batch sentences into chunks that fit max_length
-    chunks = []
-    current_chunk = []
-    current_len = 0
-    for s in sentences:
-        s_len = len(tokenizer.encode(s))
-        if current_len + s_len > max_length - 10 and current_chunk:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [s]
-            current_len = s_len
-        else:
-            current_chunk.append(s)
-            current_len += s_len
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
+def resolve_decoding(options):
+    """
+    Merge a preset with explicit overrides from CLI flags / job fields:
+    preset, beams, greedy, length_penalty, max_len_ratio, max_len_offset.
+    """
+    preset = options.get('preset') or 'default'
+    if preset not in DECODING_PRESETS:
+        raise ValueError(f"Unknown decoding preset '{preset}' (expected one of: {', '.join(DECODING_PRESETS)})")
+
+    decoding = dict(DECODING_PRESETS[preset], preset=preset)
+    if options.get('beams'):
+        decoding['num_beams'] = int(options['beams'])
+    if options.get('greedy'):
+        decoding['num_beams'] = 1
+    for key in ('length_penalty', 'max_len_ratio', 'max_len_offset'):
+        if options.get(key) is not None:
+            decoding[key] = float(options[key])
+    if decoding['max_len_ratio'] is not None or decoding['max_len_offset'] is not None:
+        for key, value in PROPORTIONAL_CAP.items():
+            if decoding[key] is None:
+                decoding[key] = value
+    return decoding
+
+
+def decoding_signature(decoding):
+    """
+    Translation memory key suffix for every setting that can change the
+    stored translation, including a proportional output cap: a capped run
+    may store a truncated translation, which must not be served to another
+    cap. Empty for the default preset, whose entries predate presets.
+    """
+    parts = []
+    if decoding['num_beams'] is not None or decoding['length_penalty'] is not None:
+        parts.append(f"beams={decoding['num_beams']},lp={decoding['length_penalty']}")
+    if decoding['max_len_ratio'] is not None:
+        parts.append(f"cap={decoding['max_len_ratio']:g}x+{decoding['max_len_offset']:g}")
+    return '#' + ','.join(parts) if parts else ''
+
+
+def output_cap(decoding, src_tokens, max_length=512):
+    """Maximum new tokens for a batch whose longest source has src_tokens tokens."""
+    if decoding['max_len_ratio'] is None:
+        return max_length
+    cap = math.ceil(decoding['max_len_ratio'] * src_tokens + decoding['max_len_offset'])
+    return max(1, min(max_length, cap))
+
+
+def build_inputs(token_ids, tokenizer, max_length=512):
+    """Add language/EOS special tokens to pre-tokenized chunks and pad them into tensors."""
+    return tokenizer.pad(
+        {"input_ids": [tokenizer.build_inputs_with_special_tokens(ids) for ids in token_ids]},
+        padding=True, max_length=max_length, return_tensors="pt",
+    )
 
-    translated_chunks = []
-    tokenizer.src_lang = src_lang
 
-    for chunk in chunks:
-        inputs = tokenizer(chunk, return_tensors="pt", truncation=True, max_length=max_length)
+def generate_batch(token_ids, tokenizer, model, rows_by_tgt, max_length=512, decoding=None):
+    """
+    Translate one padded batch of pre-tokenized chunks (see chunk_paragraphs)
+    into one or more target languages.
+
+    rows_by_tgt maps each NLLB target code to the rows of `token_ids` it
+    still needs; returns {tgt_lang: [translations of those rows]}. On the
+    PyTorch backends the batch is encoded once and the encoder output is
+    reused for every target. decoding comes from resolve_decoding.
+    """
+    decoding = decoding or DECODING_PRESETS['default']
+    rows_by_tgt = {tgt: rows for tgt, rows in rows_by_tgt.items() if rows}
+
+    if isinstance(model, CTranslate2Model):
+        return {
+            tgt: model.translate([token_ids[r] for r in rows], tokenizer, tgt, max_length, decoding)
+            for tgt, rows in rows_by_tgt.items()
+        }
+
+    import torch
+    from transformers.modeling_outputs import BaseModelOutput
+
+    inputs = build_inputs(token_ids, tokenizer, max_length)
+    with torch.no_grad():
+        hidden = model.get_encoder()(**inputs).last_hidden_state
+
+    outputs = {}
+    for tgt, rows in rows_by_tgt.items():
+        index = torch.tensor(rows)
+        gen_kwargs = {
+            "max_new_tokens": output_cap(decoding, max(len(token_ids[r]) + 2 for r in rows), max_length),
+        }
+        if decoding['num_beams'] is not None:
+            gen_kwargs["num_beams"] = decoding['num_beams']
+            gen_kwargs["do_sample"] = False
+            gen_kwargs["early_stopping"] = decoding['num_beams'] > 1
+        if decoding['length_penalty'] is not None:
+            gen_kwargs["length_penalty"] = decoding['length_penalty']
+
         translated_tokens = model.generate(
-            **inputs,
-            forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt_lang),
-            max_new_tokens=max_length,
+            encoder_outputs=BaseModelOutput(last_hidden_state=hidden.index_select(0, index)),
+            attention_mask=inputs["attention_mask"].index_select(0, index),
+            forced_bos_token_id=tokenizer.convert_tokens_to_ids(tgt),
+            **gen_kwargs,
         )
-        result = tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)[0]
-        translated_chunks.append(result)
+        outputs[tgt] = tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
+    return outputs
 
-    return ' '.join(translated_chunks)
 
+def normalize_chunk(text):
+    """Collapse runs of whitespace so identical sentences share one key."""
+    return ' '.join(text.split())
 
-def main():
-    parser = argparse.ArgumentParser(description='Translate text using NLLB-200')
-    parser.add_argument('--input', required=True, help='Input text file (or JSON array in --json mode)')
-    parser.add_argument('--output', required=True, help='Output text file (or JSON array in --json mode)')
-    parser.add_argument('--src', required=True, help='Source language code (ISO 639-1 or NLLB code)')
-    parser.add_argument('--tgt', required=True, help='Target language code (ISO 639-1 or NLLB code)')
-    parser.add_argument('--json', action='store_true', help='JSON mode: input/output are JSON arrays of paragraphs')
 
-    args = parser.parse_args()
+def translate_paragraphs_multi(paragraphs, tokenizer, model, src_lang, tgt_langs,
+                               max_length=512, batch_tokens=DEFAULT_BATCH_TOKENS,
+                               sort_by_length=True, on_progress=None,
+                               memory=None, model_id=None,
+                               skip=None, on_paragraph=None, pool=None, decoding=None):
+    """
+    Translate many paragraphs into one or more target languages at once.
 
-    # Resolve language codes
-    src_nllb = get_nllb_code(args.src)
-    tgt_nllb = get_nllb_code(args.tgt)
+    Sentence chunks from all paragraphs are split, tokenized, normalized and
+    deduplicated once, so each distinct chunk is translated once per target
+    and fanned back out to every copy. Distinct chunks are looked up in the
+    translation memory (if given); the rest are bucketed by token length,
+    packed into padded batches of at most batch_tokens tokens, encoded once
+    and decoded for every target that still needs them, then scattered back
+    so each paragraph is re-joined in its original order.
+
+    skip maps a target to paragraph indices that are already translated
+    (e.g. when resuming); they are not translated again and come back as None.
+
+    on_progress(done, total, tgt_lang) is called whenever more paragraphs
+    complete for a target, and on_paragraph(tgt_lang, index, text) once for
+    every paragraph as soon as it is finished.
+
+    With a pool from create_pool, batches are translated by the worker
+    processes in parallel; chunking, deduplication and the translation
+    memory stay in this process and results are merged back in order.
+
+    decoding (see resolve_decoding) sets beams, length penalty and the
+    output-length cap; the default keeps the model's own beam settings.
+
+    model_id keys the translation memory and is required with one. It must
+    name the backend and decoding (backend_model_id + decoding_signature)
+    so that, e.g., int8 output is never served to an fp32 run.
+    Returns ({tgt_lang: translated_paragraphs}, stats).
+    """
+    if memory and not model_id:
+        raise ValueError("model_id is required when a translation memory is used")
+    tokenizer.src_lang = src_lang
+
+    total = len(paragraphs)
+    skip = {tgt: set((skip or {}).get(tgt, ())) for tgt in tgt_langs}
+    skip_all = set.intersection(*skip.values()) if skip else set()
+
+    chunk_owner = []
+    para_chunks = [[] for _ in range(total)]
+
+    # Distinct chunks, their token ids and lengths, and the chunk slots they fill
+    unique_index = {}
+    unique_texts = []
+    unique_tokens = []
+    unique_lens = []
+    unique_members = []
+
+    to_chunk = [p for p in range(total) if p not in skip_all]
+    chunked = chunk_paragraphs([paragraphs[p] for p in to_chunk], tokenizer, max_length)
+    for p_idx, chunks in zip(to_chunk, chunked):
+        for chunk, ids in chunks:
+            key = normalize_chunk(chunk)
+            u = unique_index.get(key)
+            if u is None:
+                u = unique_index[key] = len(unique_texts)
+                unique_texts.append(key)
+                unique_tokens.append(ids)
+                unique_lens.append(len(ids) + 2)
+                unique_members.append([])
+            unique_members[u].append(len(chunk_owner))
+            para_chunks[p_idx].append(len(chunk_owner))
+            chunk_owner.append(p_idx)
+
+    results = {tgt: [None] * len(chunk_owner) for tgt in tgt_langs}
+    remaining = {
+        tgt: [0 if p in skip[tgt] else len(para_chunks[p]) for p in range(total)]
+        for tgt in tgt_langs
+    }
+    done = {tgt: 0 for tgt in tgt_langs}
+
+    def finish(tgt, p_idx):
+        done[tgt] += 1
+        if on_paragraph:
+            on_paragraph(tgt, p_idx, ' '.join(results[tgt][i] for i in para_chunks[p_idx]))
+
+    def complete(tgt, unique_ids, outputs):
+        """Fan results out to every copy; return how many paragraphs just finished."""
+        finished = 0
+        for u, out in zip(unique_ids, outputs):
+            for i in unique_members[u]:
+                owner = chunk_owner[i]
+                if owner in skip[tgt]:
+                    continue
+                results[tgt][i] = out
+                remaining[tgt][owner] -= 1
+                if remaining[tgt][owner] == 0:
+                    finish(tgt, owner)
+                    finished += 1
+        return finished
+
+    # Paragraphs with nothing to translate are finished straight away
+    for tgt in tgt_langs:
+        for p_idx in range(total):
+            if p_idx in skip[tgt]:
+                done[tgt] += 1
+            elif not para_chunks[p_idx]:
+                finish(tgt, p_idx)
+
+    # Translation memory lookup, per target
+    hits = {}
+    missing = {}
+    for tgt in tgt_langs:
+        needed = [
+            u for u, members in enumerate(unique_members)
+            if any(chunk_owner[i] not in skip[tgt] for i in members)
+        ]
+        cached = memory.get_many(model_id, src_lang, tgt, [unique_texts[u] for u in needed]) if memory else {}
+        hits[tgt] = [u for u in needed if unique_texts[u] in cached]
+        missing[tgt] = {u for u in needed if unique_texts[u] not in cached}
+        complete(tgt, hits[tgt], [cached[unique_texts[u]] for u in hits[tgt]])
+        if on_progress and done[tgt]:
+            on_progress(done[tgt], total, tgt)
+
+    pending = sorted(set().union(*missing.values()))
+    batches = [
+        [pending[j] for j in batch]
+        for batch in make_batches([unique_lens[u] for u in pending], batch_tokens, sort_by_length)
+    ]
+    tasks = []
+    for batch in batches:
+        rows_by_tgt = {
+            tgt: [r for r, u in enumerate(batch) if u in missing[tgt]]
+            for tgt in tgt_langs
+        }
+        tasks.append((src_lang, [unique_tokens[u] for u in batch], rows_by_tgt, max_length, decoding))
+
+    if pool:
+        finished_batches = pool.imap_unordered(_pool_generate, list(enumerate(tasks)))
+    else:
+        finished_batches = (
+            (n, generate_batch(token_ids, tokenizer, model, rows_by_tgt, max_length, decoding))
+            for n, (_src, token_ids, rows_by_tgt, max_length, decoding) in enumerate(tasks)
+        )
+
+    for n, outputs in finished_batches:
+        batch = batches[n]
+        rows_by_tgt = tasks[n][2]
+        for tgt, translations in outputs.items():
+            unique_ids = [batch[r] for r in rows_by_tgt[tgt]]
+            if memory:
+                memory.put_many(model_id, src_lang, tgt,
+                                {unique_texts[u]: out for u, out in zip(unique_ids, translations)})
+            if complete(tgt, unique_ids, translations) and on_progress:
+                on_progress(done[tgt], total, tgt)
+
+    translated = {}
+    for tgt in tgt_langs:
+        translated[tgt] = [
+            None if p in skip[tgt] else ' '.join(results[tgt][i] for i in para_chunks[p])
+            for p in range(total)
+        ]
+
+    stats = {
+        "chunks": len(chunk_owner),
+        "unique_chunks": len(unique_texts),
+        "targets": {
+            tgt: {"cache_hits": len(hits[tgt]), "cache_misses": len(missing[tgt])}
+            for tgt in tgt_langs
+        },
+    }
+    stats.update(padding_stats(batches, unique_lens))
+    return translated, stats
+
+
+def translate_paragraphs(paragraphs, tokenizer, model, src_lang, tgt_lang,
+                         max_length=512, batch_tokens=DEFAULT_BATCH_TOKENS,
+                         sort_by_length=True, on_progress=None,
+                         memory=None, model_id=None, pool=None, decoding=None):
+    """
+    Translate many paragraphs into a single target language.
+    See translate_paragraphs_multi; on_progress here is on_progress(done, total).
+    Returns (translated_paragraphs, stats).
+    """
+    translated, stats = translate_paragraphs_multi(
+        paragraphs, tokenizer, model, src_lang, [tgt_lang],
+        max_length=max_length, batch_tokens=batch_tokens, sort_by_length=sort_by_length,
+        on_progress=(lambda done, total, _tgt: on_progress(done, total)) if on_progress else None,
+        memory=memory, model_id=model_id, pool=pool, decoding=decoding,
+    )
+    stats.update(stats.pop("targets")[tgt_lang])
+    return translated[tgt_lang], stats
+
+
+def translate_one(text, tokenizer, model, src_lang, tgt_lang, max_length=512,
+                  batch_tokens=DEFAULT_BATCH_TOKENS):
+    """Translate a single paragraph. Splits into sentence chunks if too long."""
+    translated, _ = translate_paragraphs([text], tokenizer, model, src_lang, tgt_lang,
+                                         max_length=max_length, batch_tokens=batch_tokens)
+    return translated[0]
+
+
+def print_progress(done, total, tgt_lang=None):
+    """
+    Report progress on the PROGRESS:current/total/percent stderr channel.
+    Multi-target runs append the target language: PROGRESS:3/10/30/jpn_Jpan
+    """
+    pct = round((done / total) * 100) if total else 100
+    suffix = f"/{tgt_lang}" if tgt_lang else ''
+    print(f"PROGRESS:{done}/{total}/{pct}{suffix}", file=sys.stderr, flush=True)
+
+
+def output_path_for(output, tgt_code, multi):
+    """
+    Output file for one target. "{tgt}" in the path is replaced by the
+    requested code; otherwise multi-target runs insert it before the
+    extension (out.json -> out.ja.json).
+    """
+    if '{tgt}' in output:
+        return output.replace('{tgt}', tgt_code)
+    if not multi:
+        return output
+    root, ext = os.path.splitext(output)
+    return f"{root}.{tgt_code}{ext}"
+
+
+class CTranslate2Model:
+    """
+    NLLB converted to CTranslate2 (int8 weights), used in place of the
+    PyTorch model by generate_batch. The HF tokenizer is still used for
+    sentencepiece encoding/decoding and language codes.
+    """
+
+    def __init__(self, model_dir, compute_type="int8", intra_threads=0, inter_threads=1):
+        self.model_dir = model_dir
+        self.compute_type = compute_type
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self._translator = None
+
+    @property
+    def translator(self):
+        # Created on first use, once create_pool / set_threads have set the thread counts
+        if self._translator is None:
+            import ctranslate2
+            self._translator = ctranslate2.Translator(
+                self.model_dir, device="cpu", compute_type=self.compute_type,
+                intra_threads=self.intra_threads, inter_threads=self.inter_threads,
+            )
+        return self._translator
+
+    def translate(self, token_ids, tokenizer, tgt_lang, max_length=512, decoding=None):
+        decoding = decoding or DECODING_PRESETS['default']
+        sources = [
+            tokenizer.convert_ids_to_tokens(tokenizer.build_inputs_with_special_tokens(ids))
+            for ids in token_ids
+        ]
+        options = {}
+        if decoding['num_beams'] is not None:
+            options['beam_size'] = decoding['num_beams']
+        if decoding['length_penalty'] is not None:
+            options['length_penalty'] = decoding['length_penalty']
+        results = self.translator.translate_batch(
+            sources,
+            target_prefix=[[tgt_lang]] * len(sources),
+            # +1 for the forced target-language token
+            max_decoding_length=output_cap(decoding, max(len(s) for s in sources), max_length) + 1,
+            **options,
+        )
+        # Drop the forced target-language token before decoding
+        return [
+            tokenizer.decode(
+                tokenizer.convert_tokens_to_ids(r.hypotheses[0][1:]),
+                skip_special_tokens=True,
+            )
+            for r in results
+        ]
+
+
+BACKENDS = ('torch', 'torch-int8', 'ctranslate2')
+DEFAULT_CT2_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'voxbook', 'nllb-200-distilled-600M-ct2-int8'
+)
+
+
+def backend_model_id(backend):
+    """Identity used for translation memory keys; quantized output differs slightly from fp32."""
+    return MODEL_NAME if backend == 'torch' else f"{MODEL_NAME}@{backend}"
+
+
+def load_tokenizer(model_name=MODEL_NAME):
+    """Load only the NLLB tokenizer (a few MB), e.g. to validate language codes."""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name)
+
+
+def load_model(model_name=MODEL_NAME, backend='torch', ct2_dir=None, tokenizer=None):
+    """
+    Load the NLLB tokenizer and model, announcing progress on stderr.
+    An already loaded tokenizer can be passed in to skip reloading it.
+
+    Backends:
+      torch        - fp32 AutoModelForSeq2SeqLM (original behaviour)
+      torch-int8   - PyTorch dynamic int8 quantization of the Linear layers
+      ctranslate2  - CTranslate2 int8 model; converted into ct2_dir on first use
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}' (expected one of: {', '.join(BACKENDS)})")
 
-    # Load model once
     print("LOADING_MODEL", file=sys.stderr, flush=True)
-    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-    model_name = "facebook/nllb-200-distilled-600M"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    tokenizer = tokenizer or load_tokenizer(model_name)
+
+    if backend == 'ctranslate2':
+        ct2_dir = ct2_dir or DEFAULT_CT2_DIR
+        if not os.path.isfile(os.path.join(ct2_dir, 'model.bin')):
+            print("CONVERTING_MODEL", file=sys.stderr, flush=True)
+            from ctranslate2.converters import TransformersConverter
+            TransformersConverter(model_name).convert(ct2_dir, quantization='int8', force=True)
+        model = CTranslate2Model(ct2_dir)
+    else:
+        from transformers import AutoModelForSeq2SeqLM
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        if backend == 'torch-int8':
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+
     print("MODEL_READY", file=sys.stderr, flush=True)
+    return tokenizer, model
+
+
+def set_threads(model, threads):
+    """Limit the intra-op threads one process uses for inference."""
+    if not threads:
+        return
+    if isinstance(model, CTranslate2Model):
+        model.intra_threads = threads
+    else:
+        import torch
+        torch.set_num_threads(threads)
+
+
+# Tokenizer/model of a pool worker (inherited from the parent when forked; the
+# parent's own in the ctranslate2 thread pool)
+_worker_state = {}
+
+
+def _init_pool_worker(backend, ct2_dir, threads):
+    if 'model' not in _worker_state:
+        # "spawn" start method (Windows): nothing is inherited, load a private copy
+        _worker_state['tokenizer'], _worker_state['model'] = load_model(backend=backend, ct2_dir=ct2_dir)
+    set_threads(_worker_state['model'], threads)
+
+
+def _pool_generate(task):
+    n, (src_lang, token_ids, rows_by_tgt, max_length, decoding) = task
+    tokenizer = _worker_state['tokenizer']
+    tokenizer.src_lang = src_lang
+    return n, generate_batch(token_ids, tokenizer, _worker_state['model'], rows_by_tgt, max_length, decoding)
+
+
+def create_pool(tokenizer, model, workers, threads=None, backend='torch', ct2_dir=None):
+    """
+    Run up to `workers` batches at once on one copy of the model, each
+    limited to `threads` intra-op threads (default: CPU count / workers).
+    Must be called before this process runs any inference itself.
+
+    PyTorch backends fork `workers` processes; they only read the weights,
+    so the parent's pages stay shared copy-on-write. The ctranslate2 backend
+    stays in this process: a single Translator with inter_threads=workers
+    runs the batches submitted from a thread pool.
+    """
+    import multiprocessing as mp
+
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    _worker_state.update(tokenizer=tokenizer, model=model)
+
+    if isinstance(model, CTranslate2Model):
+        from multiprocessing.pool import ThreadPool
+        model.inter_threads = workers
+        model.intra_threads = threads
+        return ThreadPool(workers)
+
+    method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+    return mp.get_context(method).Pool(
+        workers, initializer=_init_pool_worker, initargs=(backend, ct2_dir, threads),
+    )
+
+
+def load_stream(path):
+    """
+    Read the records of an NDJSON stream output ({"i": .., "text": ..} per
+    line) and return {index: text}. A torn last line from an interrupted
+    run is dropped and the file rewritten so new records append cleanly.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+
+    records = {}
+    valid = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+            records[int(rec["i"])] = rec["text"]
+            valid.append(line)
+        except (ValueError, KeyError, TypeError):
+            continue
+
+    if lines[-1] or len(valid) != sum(1 for line in lines if line.strip()):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(line + '\n' for line in valid)
+    return records
+
+
+def parse_targets(tgt):
+    """Accept "ja", "ja,es,fr" or a JSON list of target codes."""
+    codes = tgt if isinstance(tgt, list) else tgt.split(',')
+    return [c.strip() for c in codes if c.strip()]
 
-    if args.json:
-        # JSON mode: translate array of paragraphs individually
-        with open(args.input, 'r', encoding='utf-8') as f:
-            paragraphs = json.load(f)
 
-        total = len(paragraphs)
-        translated = []
+def resolve_languages(src, tgt, tokenizer):
+    """
+    Resolve the source and target codes of a job to NLLB codes.
 
-        for idx, para in enumerate(paragraphs):
-            result = translate_one(para, tokenizer, model, src_nllb, tgt_nllb)
-            translated.append(result)
+    Returns (src_nllb, {tgt_nllb: requested_code}), keeping one entry per
+    distinct NLLB target and the first requested code for file names.
+    Raises ValueError if any code is not a language the tokenizer knows.
+    """
+    src_nllb = get_nllb_code(src)
+    targets = {}
+    for code in parse_targets(tgt):
+        targets.setdefault(get_nllb_code(code), code)
+    validate_lang_codes([src_nllb, *targets], tokenizer)
+    return src_nllb, targets
 
-            pct = round(((idx + 1) / total) * 100)
-            print(f"PROGRESS:{idx + 1}/{total}/{pct}", file=sys.stderr, flush=True)
 
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(translated, f, ensure_ascii=False)
+def run_job(job, tokenizer, model, pool=None):
+    """
+    Run a single translation job with an already loaded model.
 
-        print(json.dumps({
+    `job` carries the same fields as the CLI flags:
+      { "input": ..., "output": ..., "src": ..., "tgt": ..., "json": bool,
+        "batch_tokens": int, "sort_by_length": bool,
+        "cache": "translation_memory.sqlite", "cache_max_mb": int,
+        "backend": "torch", "stream": bool, "resume": bool,
+        "preset": "default|fast|quality", "beams": int, "greedy": bool,
+        "length_penalty": float, "max_len_ratio": float, "max_len_offset": float }
+
+    "tgt" may list several languages ("ja,es,fr"); the source is then
+    chunked and encoded once and one output file is written per target
+    (see output_path_for).
+
+    With "stream", each finished paragraph is appended to the output as an
+    NDJSON record {"i": index, "text": translation} and flushed, instead of
+    writing one JSON array at the end; "resume" keeps the records already in
+    the file and only translates the missing indices.
+
+    Returns the summary dict that is printed as the final stdout line.
+    """
+    try:
+        src_nllb, targets = resolve_languages(job['src'], job['tgt'], tokenizer)
+    except ValueError as e:
+        return {"error": str(e)}
+    tgt_nllb = list(targets)
+    multi = len(targets) > 1
+    batch_tokens = int(job.get('batch_tokens') or DEFAULT_BATCH_TOKENS)
+    sort_by_length = job.get('sort_by_length', True)
+    backend = job.get('backend') or 'torch'
+    decoding = resolve_decoding(job)
+    model_id = backend_model_id(backend) + decoding_signature(decoding)
+    stream = job.get('stream') or job.get('resume')
+
+    if not targets:
+        return {"error": "No target language given"}
+    if stream and not job.get('json'):
+        return {"error": "--stream/--resume require --json"}
+
+    outputs = {code: output_path_for(job['output'], code, multi) for code in targets.values()}
+
+    memory = None
+    if job.get('cache'):
+        max_mb = job.get('cache_max_mb')
+        max_bytes = int(max_mb * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        memory = TranslationMemory(job['cache'], max_bytes=max_bytes)
+
+    skip = {}
+    streams = {}
+    try:
+        if job.get('json'):
+            # JSON mode: translate array of paragraphs in padded batches
+            with open(job['input'], 'r', encoding='utf-8') as f:
+                paragraphs = json.load(f)
+        else:
+            # Legacy single-text mode
+            with open(job['input'], 'r', encoding='utf-8') as f:
+                text = f.read().strip()
+            if not text:
+                return {"error": "Empty input text"}
+            paragraphs = [text]
+
+        if stream:
+            # Streaming mode: append each finished paragraph as an NDJSON record
+            for nllb, code in targets.items():
+                if job.get('resume'):
+                    skip[nllb] = {i for i in load_stream(outputs[code]) if 0 <= i < len(paragraphs)}
+                streams[nllb] = open(outputs[code], 'a' if job.get('resume') else 'w', encoding='utf-8')
+
+        def write_record(tgt, idx, text):
+            f = streams[tgt]
+            f.write(json.dumps({"i": idx, "text": text}, ensure_ascii=False) + '\n')
+            f.flush()
+
+        translated, stats = translate_paragraphs_multi(
+            paragraphs, tokenizer, model, src_nllb, tgt_nllb,
+            batch_tokens=batch_tokens, sort_by_length=sort_by_length,
+            on_progress=print_progress if multi else lambda done, total, _tgt: print_progress(done, total),
+            memory=memory, model_id=model_id,
+            skip=skip, on_paragraph=write_record if stream else None, pool=pool,
+            decoding=decoding,
+        )
+
+        if not stream:
+            for nllb, code in targets.items():
+                with open(outputs[code], 'w', encoding='utf-8') as f:
+                    if job.get('json'):
+                        json.dump(translated[nllb], f, ensure_ascii=False)
+                    else:
+                        f.write(translated[nllb][0])
+    finally:
+        for f in streams.values():
+            f.close()
+        if memory:
+            memory.close()
+
+    if stream:
+        resumed = {nllb: len(skip.get(nllb, ())) for nllb in tgt_nllb}
+        stats["stream"] = True
+        stats["resumed"] = resumed if multi else resumed[tgt_nllb[0]]
+
+    if multi:
+        return {
             "success": True,
             "src": src_nllb,
             "tgt": tgt_nllb,
-            "paragraphs": total,
-        }))
-    else:
-        # Legacy single-text mode
-        with open(args.input, 'r', encoding='utf-8') as f:
-            text = f.read().strip()
+            "backend": backend,
+            "decoding": decoding,
+            "paragraphs": len(paragraphs),
+            "outputs": outputs,
+            **stats,
+        }
+
+    stats.update(stats.pop("targets")[tgt_nllb[0]])
+    if job.get('json'):
+        return {
+            "success": True,
+            "src": src_nllb,
+            "tgt": tgt_nllb[0],
+            "backend": backend,
+            "decoding": decoding,
+            "paragraphs": len(paragraphs),
+            **stats,
+        }
+    return {
+        "success": True,
+        "src": src_nllb,
+        "tgt": tgt_nllb[0],
+        "backend": backend,
+        "decoding": decoding,
+        "input_length": len(paragraphs[0]),
+        "output_length": len(translated[tgt_nllb[0]][0]),
+        "cache_hits": stats["cache_hits"],
+    }
+
 
-        if not text:
-            print(json.dumps({"error": "Empty input text"}))
+JOB_ID_PATTERN = re.compile(r'"id"\s*:\s*(\d+)')
+
+
+def serve(tokenizer, model, defaults=None, pool=None):
+    """
+    Worker mode: read newline-delimited JSON jobs from stdin and answer
+    each one with a single JSON result line on stdout (echoing its "id").
+    The model stays loaded until stdin is closed. Options missing from a
+    job fall back to `defaults` (the worker's own CLI flags); the backend
+    is fixed by the loaded model and cannot be overridden per job.
+    """
+    defaults = defaults or {}
+    print("WORKER_READY", file=sys.stderr, flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Recovered from the raw line too, so even an unparseable job gets its answer
+        match = JOB_ID_PATTERN.search(line)
+        job_id = int(match.group(1)) if match else None
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError("Invalid job: expected a JSON object")
+            job_id = job.get('id', job_id)
+            result = run_job({**defaults, **job, 'backend': defaults.get('backend')}, tokenizer, model, pool=pool)
+        except Exception as e:
+            result = {"error": str(e)}
+
+        if job_id is not None:
+            result["id"] = job_id
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translate text using NLLB-200')
+    parser.add_argument('--input', help='Input text file (or JSON array in --json mode)')
+    parser.add_argument('--output', help='Output text file (or JSON array in --json mode)')
+    parser.add_argument('--src', help='Source language code (ISO 639-1 or NLLB code)')
+    parser.add_argument('--tgt', help='Target language code(s), comma-separated (ISO 639-1 or NLLB code)')
+    parser.add_argument('--json', action='store_true', help='JSON mode: input/output are JSON arrays of paragraphs')
+    parser.add_argument('--serve', action='store_true',
+                        help='Worker mode: keep the model loaded and read NDJSON jobs from stdin')
+    parser.add_argument('--batch-tokens', type=int, default=DEFAULT_BATCH_TOKENS,
+                        help=f'Padded token budget per generate() batch (default: {DEFAULT_BATCH_TOKENS})')
+    parser.add_argument('--no-length-sort', dest='sort_by_length', action='store_false',
+                        help='Batch chunks in document order instead of bucketing by token length')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch',
+                        help='Inference engine: torch (fp32), torch-int8 (dynamic quantization) '
+                             'or ctranslate2 (int8, fastest on CPU)')
+    parser.add_argument('--ct2-model', help=f'Converted CTranslate2 model directory (default: {DEFAULT_CT2_DIR})')
+    parser.add_argument('--stream', action='store_true',
+                        help='JSON mode: append each finished paragraph to --output as NDJSON {"i", "text"}')
+    parser.add_argument('--resume', action='store_true',
+                        help='With --stream: keep records already in --output and skip those indices')
+    parser.add_argument('--preset', choices=list(DECODING_PRESETS), default='default',
+                        help='Decoding preset: default (model settings), fast (greedy, tight length cap) '
+                             'or quality (5 beams)')
+    parser.add_argument('--beams', type=int, help='Beam count (overrides the preset)')
+    parser.add_argument('--greedy', action='store_true', help='Greedy decoding (same as --beams 1)')
+    parser.add_argument('--length-penalty', type=float, help='Beam search length penalty')
+    parser.add_argument('--max-len-ratio', type=float,
+                        help='Cap output at this multiple of source tokens (+ --max-len-offset, default 10); '
+                             'without it the cap is 512 tokens, except in the fast preset')
+    parser.add_argument('--max-len-offset', type=float,
+                        help='Tokens added to the proportional output cap (ratio defaults to 1.5)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Translate N batches at once on one copy of the model weights '
+                             '(forked processes; translator threads for ctranslate2)')
+    parser.add_argument('--threads', type=int,
+                        help='Intra-op threads per worker (default: CPU count / workers)')
+    parser.add_argument('--cache', help='SQLite translation memory file (reused across runs)')
+    parser.add_argument('--cache-max-mb', type=float,
+                        help=f'Translation memory size cap in MB (default: {DEFAULT_MAX_BYTES // (1024 * 1024)})')
+
+    args = parser.parse_args()
+
+    if not args.serve:
+        missing = [f'--{name}' for name in ('input', 'output', 'src', 'tgt') if not getattr(args, name)]
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
+
+    # Reject unknown language codes before paying for the model load
+    tokenizer = load_tokenizer()
+    if not args.serve:
+        try:
+            resolve_languages(args.src, args.tgt, tokenizer)
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
             sys.exit(1)
 
-        translated = translate_one(text, tokenizer, model, src_nllb, tgt_nllb)
+    # Load model once
+    tokenizer, model = load_model(backend=args.backend, ct2_dir=args.ct2_model, tokenizer=tokenizer)
+
+    pool = None
+    if args.workers > 1:
+        pool = create_pool(tokenizer, model, args.workers, args.threads,
+                           backend=args.backend, ct2_dir=args.ct2_model)
+    else:
+        set_threads(model, args.threads)
 
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(translated)
+    try:
+        if args.serve:
+            serve(tokenizer, model, defaults={
+                'batch_tokens': args.batch_tokens,
+                'sort_by_length': args.sort_by_length,
+                'cache': args.cache,
+                'cache_max_mb': args.cache_max_mb,
+                'backend': args.backend,
+                'preset': args.preset,
+                'beams': args.beams,
+                'greedy': args.greedy,
+                'length_penalty': args.length_penalty,
+                'max_len_ratio': args.max_len_ratio,
+                'max_len_offset': args.max_len_offset,
+            }, pool=pool)
+            return
 
-        print(json.dumps({
-            "success": True,
-            "src": src_nllb,
-            "tgt": tgt_nllb,
-            "input_length": len(text),
-            "output_length": len(translated),
-        }))
+        result = run_job(vars(args), tokenizer, model, pool=pool)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    print(json.dumps(result))
+    if result.get('error'):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
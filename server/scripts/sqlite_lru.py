@@ -0,0 +1,71 @@
+"""
+Size-capped SQLite store with least-recently-used eviction.
+
+Shared bookkeeping for translation_memory.py and voxalign/cache.py: the
+database is opened in WAL mode (several worker processes may share one
+file), every row records its size in bytes and when it was last used,
+hits are touched on read, and once the stored size exceeds max_bytes the
+least recently used rows are dropped until it is under 90% of the cap.
+
+Subclasses name their table and create it (with NOT NULL `size` and
+`last_used` columns) in create_tables.
+"""
+
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+
+
+class SQLiteLRU(ABC):
+    # Table holding the size-capped rows; set by subclasses
+    table = None
+
+    def __init__(self, path, max_bytes):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)"
+        )
+        self.conn.commit()
+
+    @abstractmethod
+    def create_tables(self):
+        """Create `table` (and any other tables) if they do not exist yet."""
+
+    def touch(self, where, keys):
+        """Mark the rows matching `where` for each parameter tuple in keys as just used."""
+        now = time.time()
+        self.conn.executemany(
+            f"UPDATE {self.table} SET last_used = ? WHERE {where}",
+            [(now, *key) for key in keys],
+        )
+        self.conn.commit()
+
+    def evict(self):
+        """Drop least-recently-used rows until the store is under 90% of max_bytes."""
+        total = self.conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        rows = self.conn.execute(
+            f"SELECT rowid, size FROM {self.table} ORDER BY last_used ASC"
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if total <= target:
+                break
+            doomed.append((rowid,))
+            total -= size
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE rowid = ?", doomed)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from nllb_translate import (
+    CTranslate2Model,
+    chunk_paragraphs,
+    decoding_signature,
+    load_stream,
+    output_cap,
+    resolve_decoding,
+    run_job,
+    validate_lang_codes,
+)
+
+
+class WordTokenizer:
+    """One token id per whitespace-separated word."""
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [list(range(len(t.split()))) for t in texts]}
+
+
+class VocabTokenizer:
+    """Language tokens as additional special tokens; other pieces in the plain vocab."""
+
+    unk_token_id = 3
+    additional_special_tokens = ['eng_Latn', 'jpn_Jpan']
+    vocab = {'eng_Latn': 256047, 'jpn_Jpan': 256079, 'ab': 870, 'xx': 4114}
+
+    def convert_tokens_to_ids(self, token):
+        return self.vocab.get(token, self.unk_token_id)
+
+
+class EchoTokenizer(WordTokenizer, VocabTokenizer):
+    """Word tokenizer that also knows the eng/jpn/fra language tokens."""
+
+    additional_special_tokens = ['eng_Latn', 'jpn_Jpan', 'fra_Latn']
+    vocab = {'eng_Latn': 256047, 'jpn_Jpan': 256079, 'fra_Latn': 256057}
+    src_lang = 'eng_Latn'
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[len(w) for w in t.split()] for t in texts]}
+
+
+class EchoModel(CTranslate2Model):
+    """Stands in for a loaded model: "translates" by tagging the source ids, and logs each batch."""
+
+    def __init__(self):
+        super().__init__(None)
+        self.calls = []
+
+    def translate(self, token_ids, tokenizer, tgt_lang, max_length=512, decoding=None):
+        self.calls.append((tgt_lang, len(token_ids)))
+        return [f"{tgt_lang}:{len(ids)}" for ids in token_ids]
+
+
+def write_lines(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(lines)
+
+
+def test_oversized_first_sentence_is_truncated():
+    para = ' '.join(['word'] * 600) + '. Short end.'
+    chunks = chunk_paragraphs([para], WordTokenizer(), max_length=512)[0]
+    assert [len(ids) for _, ids in chunks] == [510, 2]
+
+
+def test_sentences_packed_within_budget():
+    para = ' '.join(['Five words in a sentence.'] * 4)
+    chunks = chunk_paragraphs([para], WordTokenizer(), max_length=20)[0]
+    assert [len(ids) for _, ids in chunks] == [10, 10]
+
+
+def test_language_tokens_accepted():
+    validate_lang_codes(['eng_Latn', 'jpn_Jpan'], VocabTokenizer())
+
+
+@pytest.mark.parametrize('code', ['ab', 'xx', 'fra_Latn'])
+def test_non_language_tokens_rejected(code):
+    with pytest.raises(ValueError, match=code):
+        validate_lang_codes(['eng_Latn', code], VocabTokenizer())
+
+
+def test_default_preset_keeps_max_length_cap():
+    decoding = resolve_decoding({})
+    assert output_cap(decoding, 20) == 512
+    assert decoding_signature(decoding) == ''
+
+
+def test_proportional_cap_only_when_requested():
+    assert output_cap(resolve_decoding({'preset': 'fast'}), 20) == 31
+    assert output_cap(resolve_decoding({'max_len_ratio': 2}), 20) == 50
+    assert output_cap(resolve_decoding({'max_len_offset': 0}), 20) == 30
+    assert output_cap(resolve_decoding({'max_len_ratio': 100}), 20) == 512
+
+
+def test_output_cap_changes_memory_key():
+    default = decoding_signature(resolve_decoding({}))
+    assert decoding_signature(resolve_decoding({'max_len_ratio': 1.0})) != default
+    assert decoding_signature(resolve_decoding({'max_len_offset': 0})) != default
+    assert decoding_signature(resolve_decoding({'max_len_ratio': 1.0})) != \
+        decoding_signature(resolve_decoding({'max_len_ratio': 1.5}))
+
+
+def test_load_stream_drops_torn_last_line(tmp_path):
+    path = tmp_path / 'out.ndjson'
+    write_lines(path, '{"i": 0, "text": "a"}\n{"i": 2, "text": "c"}\n{"i": 1, "te')
+    assert load_stream(str(path)) == {0: 'a', 2: 'c'}
+    # The torn record is gone, so the next append starts on a fresh line
+    assert path.read_text(encoding='utf-8') == '{"i": 0, "text": "a"}\n{"i": 2, "text": "c"}\n'
+
+
+def test_resume_skips_written_indices_per_target(tmp_path):
+    paragraphs = ['One.', 'Two two.', 'Three three three.', 'Four four four four.']
+    source = tmp_path / 'paras.json'
+    source.write_text(json.dumps(paragraphs), encoding='utf-8')
+    output = str(tmp_path / 'out_{tgt}.ndjson')
+    # ja finished 0 and 2 (then a torn line); fr finished only 1
+    write_lines(tmp_path / 'out_ja.ndjson', '{"i": 0, "text": "old0"}\n{"i": 2, "text": "old2"}\n{"i": 3,')
+    write_lines(tmp_path / 'out_fr.ndjson', '{"i": 1, "text": "old1"}\n')
+
+    model = EchoModel()
+    result = run_job({
+        "input": str(source), "output": output, "src": "en", "tgt": "ja,fr",
+        "json": True, "resume": True, "backend": "ctranslate2",
+    }, EchoTokenizer(), model)
+
+    assert result["success"] and result["resumed"] == {"jpn_Jpan": 2, "fra_Latn": 1}
+    ja = load_stream(str(tmp_path / 'out_ja.ndjson'))
+    fr = load_stream(str(tmp_path / 'out_fr.ndjson'))
+    assert ja == {0: 'old0', 1: 'jpn_Jpan:2', 2: 'old2', 3: 'jpn_Jpan:4'}
+    assert fr == {0: 'fra_Latn:1', 1: 'old1', 2: 'fra_Latn:3', 3: 'fra_Latn:4'}
+    # Only the missing paragraphs were translated for each target
+    assert sum(n for tgt, n in model.calls if tgt == 'jpn_Jpan') == 2
+    assert sum(n for tgt, n in model.calls if tgt == 'fra_Latn') == 3
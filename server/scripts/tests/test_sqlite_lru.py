@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlite_lru import SQLiteLRU
+from translation_memory import TranslationMemory
+from voxalign.cache import AlignmentCache
+
+
+def test_translation_memory_evicts_least_recently_used(tmp_path):
+    memory = TranslationMemory(str(tmp_path / 'tm.sqlite'), max_bytes=100)
+    memory.put_many('m', 'eng_Latn', 'jpn_Jpan', {'a' * 20: 'x' * 20})
+    memory.put_many('m', 'eng_Latn', 'jpn_Jpan', {'b' * 20: 'x' * 20})
+    assert memory.get_many('m', 'eng_Latn', 'jpn_Jpan', ['a' * 20])
+    memory.put_many('m', 'eng_Latn', 'jpn_Jpan', {'c' * 20: 'x' * 20})
+    kept = memory.get_many('m', 'eng_Latn', 'jpn_Jpan', ['a' * 20, 'b' * 20, 'c' * 20])
+    assert sorted(kept) == ['a' * 20, 'c' * 20]
+    memory.close()
+
+
+def test_alignment_cache_evicts_least_recently_used(tmp_path):
+    cache = AlignmentCache(str(tmp_path / 'cache.sqlite'), max_bytes=100)
+    cache.put('transcript', 'a', 'x' * 40)
+    cache.put('transcript', 'b', 'x' * 40)
+    assert cache.get('transcript', 'a')
+    cache.put('transcript', 'c', 'x' * 40)
+    assert cache.get('transcript', 'b') is None
+    assert cache.get('transcript', 'a') and cache.get('transcript', 'c')
+    cache.close()
+
+
+def test_subclass_must_create_its_tables(tmp_path):
+    class NoTables(SQLiteLRU):
+        table = 'rows'
+
+    with pytest.raises(TypeError):
+        NoTables(str(tmp_path / 'lru.sqlite'), max_bytes=100)
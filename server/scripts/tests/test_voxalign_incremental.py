@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from voxalign.incremental import edit_windows, splice, stable_words
+
+OLD = ["a", "b", "c", "d", "e", "f", "g", "h"]
+OLD_START = np.arange(8.0)
+OLD_END = OLD_START + 0.5
+
+
+def windows_for(new):
+    old_index = stable_words(OLD, new, OLD_START, OLD_END)
+    return old_index, edit_windows(old_index, OLD_START, OLD_END)
+
+
+def test_stable_words_skip_edits_and_untimed_words():
+    old_start = OLD_START.copy()
+    old_start[6] = np.nan
+    new = ["a", "b", "c", "X", "e", "f", "g", "h"]
+    assert stable_words(OLD, new, old_start, OLD_END).tolist() == [0, 1, 2, -1, 4, 5, -1, 7]
+
+
+def test_substitution_window_spans_context():
+    # The replaced word's old neighbour "e" borders it too, so the window runs to "g"
+    old_index, windows = windows_for(["a", "b", "c", "X", "e", "f", "g", "h"])
+    assert windows == [(1, 7, 0.5, 7.0)]
+    assert all(type(v) is int for lo, hi, _, _ in windows for v in (lo, hi))
+
+
+def test_nearby_edits_merge_into_one_window():
+    _, windows = windows_for(["a", "X", "c", "d", "Y", "f", "g", "h"])
+    assert windows == [(0, 8, 0.0, None)]
+    assert all(type(v) is int for lo, hi, _, _ in windows for v in (lo, hi))
+
+
+def test_deletion_in_the_middle():
+    _, windows = windows_for(["a", "b", "c", "e", "f", "g", "h"])
+    assert windows == [(0, 6, 0.0, 7.0)]
+
+
+def test_deletion_at_start():
+    _, windows = windows_for(["c", "d", "e", "f", "g", "h"])
+    assert windows == [(0, 3, 0.0, 5.0)]
+
+
+def test_deletion_at_end():
+    _, windows = windows_for(["a", "b", "c", "d", "e", "f"])
+    assert windows == [(3, 6, 2.5, None)]
+
+
+def test_unchanged_text_has_no_windows():
+    _, windows = windows_for(list(OLD))
+    assert windows == []
+
+
+def test_splice_keeps_stable_times():
+    old_index, windows = windows_for(["a", "b", "c", "X", "e", "f", "g", "h"])
+    window_times = [(np.arange(1.0, 7.0) + 0.25, np.arange(1.0, 7.0) + 0.75)]
+    start, end = splice(old_index, OLD_START, OLD_END, windows, window_times)
+    np.testing.assert_allclose(start, [0.0, 1.25, 2.25, 3.25, 4.25, 5.25, 6.25, 7.0])
+    np.testing.assert_allclose(end, [0.5, 1.75, 2.75, 3.75, 4.75, 5.75, 6.75, 7.5])
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from voxalign import match_words
+
+
+def detected(words):
+    """Detected word i spans [i, i + 0.5] seconds."""
+    return [{"word": w, "start": float(i), "end": i + 0.5} for i, w in enumerate(words)]
+
+
+def assert_times(actual, expected):
+    np.testing.assert_allclose(actual, expected, equal_nan=True)
+
+
+def test_dropped_word_left_unknown():
+    start, end = match_words(detected(["the", "quick", "fox"]), ["The", "quick", "brown", "fox."])
+    assert_times(start, [0, 1, np.nan, 2])
+    assert_times(end, [0.5, 1.5, np.nan, 2.5])
+
+
+def test_inserted_word_skipped():
+    start, end = match_words(detected(["the", "quick", "um", "brown", "fox"]), ["The", "quick", "brown", "fox"])
+    assert_times(start, [0, 1, 3, 4])
+    assert_times(end, [0.5, 1.5, 3.5, 4.5])
+
+
+def test_one_expected_word_over_several_detected():
+    start, end = match_words(detected(["I", "don", "t", "know"]), ["I", "don't", "know"])
+    assert_times(start, [0, 1, 3])
+    assert_times(end, [0.5, 2.5, 3.5])
+
+
+def test_several_expected_words_share_one_detected():
+    start, end = match_words(detected(["I", "cannot", "go"]), ["I", "can", "not", "go"])
+    assert_times(start, [0, 1, 1.25, 2])
+    assert_times(end, [0.5, 1.25, 1.5, 2.5])
+
+
+def test_punctuation_only_tokens_cost_nothing():
+    start, _ = match_words(detected(["hello", "world"]), ["hello", "—", "world"])
+    assert_times(start, [0, np.nan, 1])
+    start, _ = match_words(detected(["hello", "—", "world"]), ["hello", "world"])
+    assert_times(start, [0, 2])
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from voxalign.output import write_output
+
+
+def test_npy_written_to_the_exact_path(tmp_path):
+    path = tmp_path / 'alignment.bin'
+    write_output(str(path), ['a', 'b'], np.array([0.0, 1.0]), np.array([1.0, np.nan]), fmt='npy')
+    assert os.listdir(tmp_path) == ['alignment.bin']
+    assert np.load(path).tolist() == [[0.0, 1.0], [1.0, 0.0]]
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from voxalign import close_gaps, distribute_by_chars, distribute_segments_to_words, interpolate_gaps
+from voxalign.timing import FALLBACK_WORD_DURATION
+
+
+def test_interpolate_gaps_at_start_middle_and_end():
+    nan = np.nan
+    start = np.array([nan, nan, 2.0, nan, nan, 5.0, nan, nan])
+    end = np.array([nan, nan, 2.5, nan, nan, 5.5, nan, nan])
+    interpolate_gaps(start, end)
+    # Leading run spreads from 0 to the first known start
+    np.testing.assert_allclose(start[:2], [0.0, 1.0])
+    np.testing.assert_allclose(end[:2], [1.0, 2.0])
+    # Middle run fills the silence between its neighbours
+    np.testing.assert_allclose(start[3:5], [2.5, 3.75])
+    np.testing.assert_allclose(end[3:5], [3.75, 5.0])
+    # Trailing run gets the fallback duration per word
+    d = FALLBACK_WORD_DURATION
+    np.testing.assert_allclose(start[6:], [5.5, 5.5 + d])
+    np.testing.assert_allclose(end[6:], [5.5 + d, 5.5 + 2 * d])
+
+
+def test_close_gaps_only_below_two_seconds():
+    start = np.array([0.0, 1.0, 4.0, 4.5])
+    end = np.array([0.5, 2.0, 4.2, 5.0])
+    close_gaps(start, end)
+    # 0.5s and 0.3s gaps are closed, the 2s pause is kept
+    np.testing.assert_allclose(end, [1.0, 2.0, 4.5, 5.0])
+    np.testing.assert_allclose(start, [0.0, 1.0, 4.0, 4.5])
+
+
+def test_distribute_by_chars_proportional_within_spans():
+    start, end = distribute_by_chars(["a", "bbb", "cc", "dd"], [0.0, 10.0], [4.0, 12.0], [0, 0, 1, 1])
+    np.testing.assert_allclose(start, [0.0, 1.0, 10.0, 11.0])
+    np.testing.assert_allclose(end, [1.0, 4.0, 11.0, 12.0])
+
+
+def test_distribute_segments_to_words():
+    segments = [{"start": 0, "end": 2, "text": "one two"}, {"start": 3, "end": 4, "text": "three"}]
+    start, end = distribute_segments_to_words(segments, ["aa", "bb", "cc", "dd"])
+    np.testing.assert_allclose(start, [0.0, 2 / 3, 4 / 3, 3.0])
+    np.testing.assert_allclose(end, [2 / 3, 4 / 3, 2.0, 4.0])
+
+
+def test_distribute_segments_without_segments():
+    start, end = distribute_segments_to_words([], ["a", "b"])
+    np.testing.assert_allclose(start, [0.0, 0.5])
+    np.testing.assert_allclose(end, [0.5, 1.0])
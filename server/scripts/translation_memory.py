@@ -0,0 +1,82 @@
+"""
+On-disk translation memory for nllb_translate.py.
+
+Stores translated sentence chunks in SQLite, keyed by
+(model, source language, target language, source text), so repeated
+headings, boilerplate and unchanged paragraphs are never sent through
+the model twice. Entries are evicted least-recently-used first once the
+stored text exceeds a size cap (see sqlite_lru.py).
+
+Usage:
+  memory = TranslationMemory("storage/books/<id>/translation_memory.sqlite")
+  hits = memory.get_many(model_id, "eng_Latn", "jpn_Jpan", chunks)
+  memory.put_many(model_id, "eng_Latn", "jpn_Jpan", {"Chapter I": "第一章"})
+  memory.close()
+"""
+
+import time
+
+from sqlite_lru import SQLiteLRU
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# SQLite's default limit on bound parameters is 999
+_QUERY_BATCH = 500
+
+
+class TranslationMemory(SQLiteLRU):
+    table = 'tm'
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    def create_tables(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tm (
+                model TEXT NOT NULL,
+                src TEXT NOT NULL,
+                tgt TEXT NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, src, tgt, source)
+            )
+        """)
+
+    def get_many(self, model, src, tgt, texts):
+        """Return {source_text: translation} for every text already stored."""
+        unique = list(dict.fromkeys(texts))
+        found = {}
+        for i in range(0, len(unique), _QUERY_BATCH):
+            part = unique[i:i + _QUERY_BATCH]
+            placeholders = ','.join('?' * len(part))
+            rows = self.conn.execute(
+                f"SELECT source, target FROM tm WHERE model = ? AND src = ? AND tgt = ? "
+                f"AND source IN ({placeholders})",
+                [model, src, tgt, *part],
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            # Touch hits so they survive LRU eviction
+            self.touch("model = ? AND src = ? AND tgt = ? AND source = ?",
+                       [(model, src, tgt, source) for source in found])
+        return found
+
+    def put_many(self, model, src, tgt, translations):
+        """Store {source_text: translation} pairs and enforce the size cap."""
+        if not translations:
+            return
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tm (model, src, tgt, source, target, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (model, src, tgt, source, target,
+                 len(source.encode('utf-8')) + len(target.encode('utf-8')), now)
+                for source, target in translations.items()
+            ],
+        )
+        self.conn.commit()
+        self.evict()
@@ -0,0 +1,67 @@
+"""
+Shared word-alignment core for the alignment scripts.
+
+  match     - banded DP matcher from detected words to expected words
+  timing    - interpolation, gap closing and segment distribution on
+              start/end float arrays
+  output    - the JSON / binary alignment files the scripts write
+  audio     - the decoded-PCM cache and splitting audio into windows at pauses
+
+Run `python -m voxalign --help` for the command-line post-processor.
+"""
+
+from .audio import SAMPLE_RATE, load_pcm, open_pcm, split_on_silence, voiced_seconds
+from .match import align_tokens, match_words, normalize
+from .output import (
+    FORMATS,
+    duration_of,
+    read_binary,
+    read_lines,
+    sentence_entries,
+    word_entries,
+    write_output,
+    write_sentences,
+    write_words,
+)
+from .timing import (
+    align_to_expected,
+    assign_to_windows,
+    close_gaps,
+    distribute_by_chars,
+    distribute_segments_to_words,
+    empty_times,
+    interpolate_gaps,
+    sentence_times,
+    sentence_words,
+    to_arrays,
+)
+
+__all__ = [
+    'FORMATS',
+    'SAMPLE_RATE',
+    'align_to_expected',
+    'align_tokens',
+    'assign_to_windows',
+    'close_gaps',
+    'distribute_by_chars',
+    'distribute_segments_to_words',
+    'duration_of',
+    'empty_times',
+    'interpolate_gaps',
+    'load_pcm',
+    'match_words',
+    'normalize',
+    'open_pcm',
+    'read_binary',
+    'read_lines',
+    'sentence_entries',
+    'sentence_times',
+    'sentence_words',
+    'split_on_silence',
+    'to_arrays',
+    'voiced_seconds',
+    'word_entries',
+    'write_output',
+    'write_sentences',
+    'write_words',
+]
@@ -0,0 +1,62 @@
+"""
+Map a detected word-timing file onto the expected words of a chapter.
+
+Usage (from server/scripts):
+  python -m voxalign <timing_json> <text_path> <output_path> [--one-to-one] [--close-gaps] [--format json|bin|npy]
+
+Input:
+  timing_json      - Detected words: [{ "word", "start", "end" }, ...]
+                     (edge-tts _timing.json, or any engine's word list)
+  text_path        - Expected words, ONE WORD PER LINE
+  output_path      - Where to write [{ "id", "word", "start", "end" }, ...]
+                     (or float32 arrays with --format bin / npy)
+
+Prints {"progress": ...} lines and a final {"success": true, ...} line,
+like the other alignment scripts.
+"""
+
+import argparse
+import json
+
+from . import FORMATS, align_to_expected, close_gaps, duration_of, read_lines, write_output
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m voxalign',
+                                     description='Map detected word timings onto expected words')
+    parser.add_argument('timing_json', help='Detected words with start/end times')
+    parser.add_argument('text_path', help='Expected words, one per line')
+    parser.add_argument('output_path', help='Output alignment JSON')
+    parser.add_argument('--one-to-one', action='store_true',
+                        help='When word counts are equal, map words 1:1 without text matching')
+    parser.add_argument('--close-gaps', action='store_true',
+                        help='Extend words over silences shorter than 2s (continuous highlighting)')
+    parser.add_argument('--format', choices=FORMATS, default='json',
+                        help='Output format: json, or compact float32 start/end arrays (bin, npy)')
+    args = parser.parse_args()
+
+    with open(args.timing_json, 'r', encoding='utf-8') as f:
+        detected = json.load(f)
+    expected_words = read_lines(args.text_path)
+
+    print(json.dumps({
+        "progress": "matching",
+        "message": f"Aligning {len(detected)} detected words to {len(expected_words)} expected words..."
+    }), flush=True)
+    start, end = align_to_expected(detected, expected_words, one_to_one=args.one_to_one)
+    if args.close_gaps:
+        close_gaps(start, end)
+
+    write_output(args.output_path, expected_words, start, end, args.format)
+
+    print(json.dumps({
+        "success": True,
+        "wordCount": len(expected_words),
+        "detectedWordCount": len(detected),
+        "duration": duration_of(end),
+        "format": args.format,
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Decoded-audio helpers for the alignment scripts.
+
+Audio is mono float32 PCM at SAMPLE_RATE, as returned by
+whisperx.load_audio.
+
+split_on_silence cuts a long waveform into windows at pauses, so the
+windows can be transcribed independently (in parallel) and their
+timestamps shifted back by the window offset. voiced_seconds measures
+how much speech each window holds, for handing known text out to
+windows without transcribing them. Voice activity is a plain
+frame-energy threshold: audiobook narration has clean pauses, and this
+needs nothing beyond NumPy.
+
+load_pcm keeps the decoded waveform next to the source file
+(chapter_1.mp3 -> chapter_1.pcm16k-<size>-<mtime_ns>.npy) and maps it with
+np.load(mmap_mode="c"): a repeated job, another engine or sentence mode
+skips ffmpeg, and processes that open the same file share its pages.
+"""
+
+import glob
+import os
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Energy analysis frame (s)
+FRAME_SEC = 0.03
+
+# Frames this far (dB) below the loud (95th percentile) level are silence
+SILENCE_DB = 35.0
+
+# Pauses shorter than this are never cut at (mid-word stops, plosives)
+MIN_SILENCE_SEC = 0.3
+
+# Preferred window length (s); cuts land at the pause nearest each target
+CHUNK_TARGET_SEC = 300.0
+
+PCM_CACHE_TAG = "pcm16k"
+
+
+def pcm_cache_path(path):
+    """Decoded-PCM cache file for `path`, named after its current size and mtime."""
+    st = os.stat(path)
+    base = os.path.splitext(path)[0]
+    return f"{base}.{PCM_CACHE_TAG}-{st.st_size}-{st.st_mtime_ns}.npy"
+
+
+def open_pcm(cache_path):
+    """Memory-map a decoded-PCM cache file (copy-on-write, so callers may modify it)."""
+    return np.load(cache_path, mmap_mode="c")
+
+
+def load_pcm(path, decode):
+    """
+    Decoded audio for `path`: memory-mapped from the PCM cache when the
+    source is unchanged, otherwise `decode(path)` (e.g. whisperx.load_audio)
+    and stored for next time. Returns (audio, cache_path); cache_path is
+    None if the cache could not be written (audio is then in memory).
+    """
+    cache_path = pcm_cache_path(path)
+    try:
+        return open_pcm(cache_path), cache_path
+    except (OSError, ValueError):
+        pass
+
+    audio = np.ascontiguousarray(decode(path), dtype=np.float32)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return audio, None
+
+    # Drop caches of earlier versions of the file
+    base = os.path.splitext(path)[0]
+    for stale in glob.glob(f"{glob.escape(base)}.{PCM_CACHE_TAG}-*.npy"):
+        if stale != cache_path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return open_pcm(cache_path), cache_path
+
+
+def quiet_frames(audio, sample_rate=SAMPLE_RATE, silence_db=SILENCE_DB):
+    """
+    Per-frame silence mask of the waveform (FRAME_SEC frames, trailing
+    partial frame dropped). Returns (quiet, frame_samples).
+    """
+    frame = max(1, int(FRAME_SEC * sample_rate))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool), frame
+
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1)) + 1e-10
+    level = 20 * np.log10(rms)
+    return level < np.percentile(level, 95) - silence_db, frame
+
+
+def silence_midpoints(audio, sample_rate=SAMPLE_RATE, silence_db=SILENCE_DB,
+                      min_silence=MIN_SILENCE_SEC):
+    """Sample index at the middle of every pause of at least min_silence seconds."""
+    quiet, frame = quiet_frames(audio, sample_rate, silence_db)
+    if not len(quiet):
+        return np.zeros(0, dtype=np.int64)
+
+    # Runs of quiet frames: +1 where a run starts, -1 one past where it ends
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    run_start = np.flatnonzero(edges == 1)
+    run_end = np.flatnonzero(edges == -1)
+    long_enough = (run_end - run_start) * frame >= min_silence * sample_rate
+    mid = (run_start[long_enough] + run_end[long_enough]) // 2
+    return mid.astype(np.int64) * frame
+
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, target_sec=CHUNK_TARGET_SEC):
+    """
+    Window boundaries [(start_sample, end_sample), ...] covering the whole
+    waveform. Each cut is made at the pause closest to target_sec after the
+    previous cut (searched between half and one and a half targets); with
+    no pause in that range the cut is made at the target itself.
+    """
+    n = len(audio)
+    target = int(target_sec * sample_rate)
+    if n <= target * 1.5:
+        return [(0, n)]
+
+    cuts = silence_midpoints(audio, sample_rate)
+    windows = []
+    cursor = 0
+    while n - cursor > target * 1.5:
+        goal = cursor + target
+        lo = np.searchsorted(cuts, cursor + target // 2)
+        hi = np.searchsorted(cuts, cursor + target * 3 // 2)
+        if hi > lo:
+            candidates = cuts[lo:hi]
+            cut = int(candidates[np.argmin(np.abs(candidates - goal))])
+        else:
+            cut = goal
+        windows.append((cursor, cut))
+        cursor = cut
+    windows.append((cursor, n))
+    return windows
+
+
+def voiced_seconds(audio, windows, sample_rate=SAMPLE_RATE):
+    """Seconds of non-silent audio in each (start_sample, end_sample) window."""
+    quiet, frame = quiet_frames(audio, sample_rate)
+    # Voiced frames before each frame boundary
+    voiced = np.concatenate(([0], np.cumsum(~quiet)))
+    bounds = np.array(windows, dtype=np.int64).reshape(-1, 2) // frame
+    bounds = np.minimum(bounds, len(quiet))
+    return (voiced[bounds[:, 1]] - voiced[bounds[:, 0]]) * frame / sample_rate
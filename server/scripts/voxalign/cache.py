@@ -0,0 +1,126 @@
+"""
+On-disk cache of transcriptions and alignments for the alignment scripts.
+
+Entries are keyed by a content hash of the audio file plus the engine,
+model and language that produced them:
+
+  transcript - ASR segments and the detected (forced-aligned) word list.
+               Independent of the expected text, so a text edit reuses it
+               and only matching runs again; word and sentence mode share it.
+  alignment  - the final start/end of every expected word, additionally
+               keyed by a hash of the expected text, so repeating an
+               unchanged job does no work at all.
+
+Entries live in SQLite and are evicted least-recently-used first once the
+stored data exceeds a size cap (see sqlite_lru.py, shared with
+translation_memory.py).
+
+Usage:
+  cache = AlignmentCache("storage/books/<id>/alignment_cache.sqlite")
+  key = cache_key(cache.audio_hash("chapter_1.mp3"), "whisperx", "base", "en")
+  transcript = cache.get("transcript", key)
+  cache.put("transcript", key, {"segments": [...], "words": [...]})
+  cache.close()
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from sqlite_lru import SQLiteLRU
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def cache_key(*parts):
+    """Join key parts (hashes, engine, model, language) into one key string."""
+    return '|'.join(str(p) for p in parts)
+
+
+def text_hash(lines):
+    """Content hash of the expected words or sentences, one item per line."""
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+class AlignmentCache(SQLiteLRU):
+    table = 'entries'
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    def create_tables(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        # Audio hashes, so unchanged files are not re-read on every job
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+        """)
+
+    def audio_hash(self, path):
+        """SHA-256 of the file's content, reused while its size and mtime are unchanged."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.conn.execute(
+            "SELECT hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+        value = digest.hexdigest()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, value),
+        )
+        self.conn.commit()
+        return value
+
+    def get(self, kind, key):
+        """Return the stored object, or None."""
+        row = self.conn.execute(
+            "SELECT data FROM entries WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        if not row:
+            return None
+        # Touch hits so they survive LRU eviction
+        self.touch("kind = ? AND key = ?", [(kind, key)])
+        return json.loads(row[0])
+
+    def put(self, kind, key, data):
+        """Store a JSON-serializable object and enforce the size cap."""
+        # default=float converts NumPy scalars from the ASR engines
+        text = json.dumps(data, separators=(',', ':'), default=float)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (kind, key, data, size, last_used) VALUES (?, ?, ?, ?, ?)",
+            (kind, key, text, len(text.encode('utf-8')), time.time()),
+        )
+        self.conn.commit()
+        self.evict()
+
+
+def open_cache(path, max_mb=None):
+    """AlignmentCache for a --cache / --cache-max-mb pair, or None without a path."""
+    if not path:
+        return None
+    max_bytes = int(max_mb * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+    return AlignmentCache(path, max_bytes=max_bytes)
@@ -0,0 +1,101 @@
+"""
+Incremental re-alignment after text edits.
+
+Given the previous alignment of a chapter and its edited word list, only
+the audio around the edits has to be aligned again:
+
+  1. diff     - the old and new word lists are matched with the same
+                anchored DP as detected words (match.align_tokens); a new
+                word is stable when it matched an identical old word with
+                a known time.
+  2. windows  - every changed word, plus CONTEXT_WORDS stable words on each
+                side, is re-aligned. Overlapping runs are merged. A window's
+                audio runs from the end of the stable word before it to the
+                start of the stable word after it.
+  3. splice   - stable words keep their previous times and each window's
+                new times are written in between.
+
+Deleted words count as an edit on both neighbours (on the one neighbour
+at the start or end of the chapter), so the freed audio is shared out
+again. Step 2's audio alignment is the caller's job (see
+realign_file in whisperx_align.py).
+
+Usage:
+  old_index = stable_words(old_words, new_words, old_start, old_end)
+  windows = edit_windows(old_index, old_start, old_end)
+  # re-align new_words[lo:hi] between t0 and t1 for each (lo, hi, t0, t1)
+  start, end = splice(old_index, old_start, old_end, windows, window_times)
+"""
+
+import numpy as np
+
+from .match import align_tokens
+
+# Unchanged words re-aligned on each side of an edit, so its neighbours
+# can move if the old boundary was wrong
+CONTEXT_WORDS = 2
+
+
+def stable_words(old_words, new_words, old_start, old_end):
+    """
+    Index into old_words of every new word carried over unchanged (same
+    text, previous time known), or -1 for new, edited and untimed words.
+    """
+    old_index = np.full(len(new_words), -1, dtype=np.int64)
+    for op in align_tokens(list(new_words), list(old_words)):
+        if op[0] == "match":
+            _, i, j = op
+            if new_words[i] == old_words[j] and not np.isnan(old_start[j] + old_end[j]):
+                old_index[i] = j
+    return old_index
+
+
+def edit_windows(old_index, old_start, old_end, context=CONTEXT_WORDS):
+    """
+    Word ranges to re-align: [(lo, hi, t0, t1), ...] meaning new words
+    lo:hi go between t0 and t1 seconds (t1 None = end of the audio).
+    Words outside every window keep old_index's times.
+    """
+    n = len(old_index)
+    changed = old_index < 0
+    # A stable word whose old predecessor is not the previous stable word
+    # borders a deletion; re-align across the gap
+    kept = np.flatnonzero(~changed)
+    jumps = kept[1:][np.diff(old_index[kept]) != 1]
+    changed[jumps] = True
+    changed[jumps - 1] = True
+    # Likewise for words deleted before the first or after the last stable word
+    if len(kept):
+        if old_index[kept[0]] != 0:
+            changed[kept[0]] = True
+        if old_index[kept[-1]] != len(old_start) - 1:
+            changed[kept[-1]] = True
+
+    windows = []
+    for i in np.flatnonzero(changed):
+        lo, hi = max(0, i - context), min(n, i + context + 1)
+        if windows and lo <= windows[-1][1]:
+            windows[-1][1] = int(hi)
+        else:
+            windows.append([int(lo), int(hi)])
+
+    result = []
+    for lo, hi in windows:
+        t0 = float(old_end[old_index[lo - 1]]) if lo > 0 else 0.0
+        t1 = float(old_start[old_index[hi]]) if hi < n else None
+        result.append((lo, hi, t0, t1))
+    return result
+
+
+def splice(old_index, old_start, old_end, windows, window_times):
+    """
+    Full start/end arrays for the new words: previous times for stable
+    words, window_times[k] = (start, end) arrays for windows[k].
+    """
+    stable = old_index >= 0
+    start = np.where(stable, np.asarray(old_start, dtype=float)[np.maximum(old_index, 0)], np.nan)
+    end = np.where(stable, np.asarray(old_end, dtype=float)[np.maximum(old_index, 0)], np.nan)
+    for (lo, hi, _, _), (win_start, win_end) in zip(windows, window_times):
+        start[lo:hi] = win_start
+        end[lo:hi] = win_end
+    return start, end
@@ -0,0 +1,261 @@
+"""
+Banded dynamic-programming word matcher.
+
+Maps words detected by an ASR engine (each with "word", "start", "end")
+onto the expected words of a chapter. Instead of walking both lists
+greedily, it computes a minimum-cost alignment (Needleman-Wunsch over
+normalized tokens), so a dropped or inserted word costs one gap and the
+rest of the chapter stays in step.
+
+Edits:
+  match / near match   - one expected word <-> one detected word
+  1:N merge            - one expected word spans several detected words ("don't" <- "don", "t")
+  N:1 merge            - several expected words share one detected word
+  gap                  - expected word not heard (interpolated later) or extra detected word
+
+Speed: tokens that occur exactly once in both lists are paired up first
+(patience-diff anchors, kept in order by a longest increasing subsequence)
+and the lists are split at those anchors, recursively. The DP only runs on
+the short windows between anchors, restricted to a band around the
+window's diagonal, so cost is O(n * band) in the worst case and close to
+linear for real chapters.
+
+Usage:
+  from voxalign import match_words
+  start, end = match_words(detected_words, expected_words)
+  # -> float arrays, one entry per expected word, NaN where nothing matched
+"""
+
+import re
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+DEFAULT_BAND = 32
+
+# Longest run of words joined by a 1:N or N:1 merge
+MAX_MERGE = 3
+
+PREFIX_COST = 0.5
+SUBSTITUTE_COST = 1.0
+GAP_COST = 1.0
+
+
+def normalize(word):
+    """Strip punctuation and lowercase for fuzzy matching."""
+    return re.sub(r'[^\w]', '', word, flags=re.UNICODE).lower()
+
+
+def _substitute_cost(a, b):
+    if a == b and a:
+        return 0.0
+    if a and b and (a.startswith(b) or b.startswith(a)):
+        return PREFIX_COST
+    return SUBSTITUTE_COST
+
+
+def _gap_cost(token):
+    # Punctuation-only tokens normalize to "" and can be skipped for free
+    return GAP_COST if token else 0.0
+
+
+def _unique_anchors(exp, det, i0, i1, j0, j1):
+    """
+    Pairs (i, j) of tokens that occur exactly once in exp[i0:i1] and once in
+    det[j0:j1], reduced to the longest subsequence increasing in both.
+    """
+    count_exp = Counter(exp[i0:i1])
+    count_det = Counter(det[j0:j1])
+    pos_det = {det[j]: j for j in range(j0, j1) if count_det[det[j]] == 1}
+    pairs = [
+        (i, pos_det[exp[i]]) for i in range(i0, i1)
+        if exp[i] and count_exp[exp[i]] == 1 and exp[i] in pos_det
+    ]
+    if not pairs:
+        return []
+
+    # Longest increasing subsequence on j (pairs are already sorted by i)
+    tails = []      # tails[k] = smallest j ending an increasing run of length k + 1
+    tail_idx = []   # index into pairs for each tails entry
+    prev = [-1] * len(pairs)
+    for p, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_idx.append(p)
+        else:
+            tails[k] = j
+            tail_idx[k] = p
+        prev[p] = tail_idx[k - 1] if k > 0 else -1
+
+    anchors = []
+    p = tail_idx[-1]
+    while p >= 0:
+        anchors.append(pairs[p])
+        p = prev[p]
+    anchors.reverse()
+    return anchors
+
+
+def _banded_align(exp, det, i0, i1, j0, j1, band):
+    """
+    Banded Needleman-Wunsch over exp[i0:i1] x det[j0:j1].
+
+    Returns ops with absolute indices:
+      ("match", i, j)          exp[i] <- det[j]
+      ("merge", i, ja, jb)     exp[i] <- det[ja:jb]
+      ("split", ia, ib, j)     exp[ia:ib] <- det[j]
+    Gaps produce no op.
+    """
+    n = i1 - i0
+    m = j1 - j0
+    if n == 0 or m == 0:
+        return []
+
+    # Keep consecutive rows' bands connected when the window is lopsided
+    band = max(band, m // n + 2)
+    lo = []
+    hi = []
+    for i in range(n + 1):
+        center = i * m // n
+        lo.append(max(0, center - band))
+        hi.append(min(m, center + band))
+
+    inf = float('inf')
+    cost = []
+    back = []
+
+    def cell(i, j):
+        if i < 0 or j < lo[i] or j > hi[i]:
+            return inf
+        return cost[i][j - lo[i]]
+
+    for i in range(n + 1):
+        row_cost = []
+        row_back = []
+        e = exp[i0 + i - 1] if i > 0 else None
+        for j in range(lo[i], hi[i] + 1):
+            if i == 0 and j == 0:
+                row_cost.append(0.0)
+                row_back.append(None)
+                continue
+            best = inf
+            move = None
+            d = det[j0 + j - 1] if j > 0 else None
+
+            if i > 0 and j > 0:
+                c = cell(i - 1, j - 1) + _substitute_cost(e, d)
+                if c < best:
+                    best, move = c, ("match", 1, 1)
+            if i > 0:
+                c = cell(i - 1, j) + _gap_cost(e)
+                if c < best:
+                    best, move = c, ("gap", 1, 0)
+            if j > 0:
+                c = (row_cost[-1] if j > lo[i] else inf) + _gap_cost(d)
+                if c < best:
+                    best, move = c, ("gap", 0, 1)
+
+            if i > 0 and j > 1 and e and d and len(e) > len(d) and e.endswith(d):
+                # 1:N — expected word spells out several detected words
+                joined = d
+                for k in range(2, min(MAX_MERGE, j) + 1):
+                    joined = det[j0 + j - k] + joined
+                    if len(joined) > len(e):
+                        break
+                    if joined == e:
+                        c = cell(i - 1, j - k)
+                        if c < best:
+                            best, move = c, ("merge", 1, k)
+                        break
+            if j > 0 and i > 1 and e and d and len(d) > len(e) and d.endswith(e):
+                # N:1 — one detected word covers several expected words
+                joined = e
+                for k in range(2, min(MAX_MERGE, i) + 1):
+                    joined = exp[i0 + i - k] + joined
+                    if len(joined) > len(d):
+                        break
+                    if joined == d:
+                        c = cell(i - k, j - 1)
+                        if c < best:
+                            best, move = c, ("split", k, 1)
+                        break
+
+            row_cost.append(best)
+            row_back.append(move)
+        cost.append(row_cost)
+        back.append(row_back)
+
+    ops = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        kind, di, dj = back[i][j - lo[i]]
+        if kind == "match":
+            ops.append(("match", i0 + i - 1, j0 + j - 1))
+        elif kind == "merge":
+            ops.append(("merge", i0 + i - 1, j0 + j - dj, j0 + j))
+        elif kind == "split":
+            ops.append(("split", i0 + i - di, i0 + i, j0 + j - 1))
+        i -= di
+        j -= dj
+    ops.reverse()
+    return ops
+
+
+def align_tokens(exp, det, band=DEFAULT_BAND):
+    """
+    Align two lists of normalized tokens. Returns the ops described in
+    _banded_align, in no particular order.
+    """
+    ops = []
+    windows = [(0, len(exp), 0, len(det))]
+    while windows:
+        i0, i1, j0, j1 = windows.pop()
+        if i0 == i1 or j0 == j1:
+            continue
+        anchors = _unique_anchors(exp, det, i0, i1, j0, j1)
+        if not anchors:
+            ops.extend(_banded_align(exp, det, i0, i1, j0, j1, band))
+            continue
+        prev_i, prev_j = i0, j0
+        for i, j in anchors:
+            windows.append((prev_i, i, prev_j, j))
+            ops.append(("match", i, j))
+            prev_i, prev_j = i + 1, j + 1
+        windows.append((prev_i, i1, prev_j, j1))
+    return ops
+
+
+def match_words(detected, expected, band=DEFAULT_BAND):
+    """
+    Map detected words ({"word", "start", "end"}) onto expected words.
+
+    Returns (start, end) float arrays with one entry per expected word;
+    NaN where no detected word was matched (fill with interpolate_gaps).
+    """
+    exp = [normalize(w) for w in expected]
+    det = [normalize(w.get("word", "")) for w in detected]
+    det_start = np.array([w.get("start", 0) for w in detected], dtype=float)
+    det_end = np.array([w.get("end", w.get("start", 0)) for w in detected], dtype=float)
+    start = np.full(len(expected), np.nan)
+    end = np.full(len(expected), np.nan)
+
+    for op in align_tokens(exp, det, band):
+        kind = op[0]
+        if kind == "match":
+            _, i, j = op
+            start[i] = det_start[j]
+            end[i] = det_end[j]
+        elif kind == "merge":
+            _, i, ja, jb = op
+            start[i] = det_start[ja]
+            end[i] = det_end[jb - 1]
+        else:
+            # One detected word split evenly over several expected words
+            _, ia, ib, j = op
+            parts = np.arange(ib - ia + 1) / (ib - ia)
+            edges = det_start[j] + parts * (det_end[j] - det_start[j])
+            start[ia:ib] = edges[:-1]
+            end[ia:ib] = edges[1:]
+    return start, end
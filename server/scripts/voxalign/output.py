@@ -0,0 +1,123 @@
+"""
+Word alignment output written by every alignment script.
+
+Formats (--format):
+  json - [{ "id": "f000001", "word": "The", "start": 0.000, "end": 0.320 }, ...]
+  bin  - b"VXA1", uint32 word count n, float32 start[n], float32 end[n]
+         (little-endian, 8-byte header, so both arrays are 4-byte aligned);
+         word i is the i-th expected word, ids are implied by index
+  npy  - NumPy .npy of a float32 array of shape (2, n): [start, end]
+
+The binary formats are a few bytes per word instead of ~80 bytes of
+pretty-printed JSON, and can be read without parsing: WhisperXAligner
+views the bin payload as Float32Arrays, np.load(mmap_mode="r") maps npy.
+
+Sentence timings are always JSON:
+  [{ "id": "s000001", "text": "The quick brown fox.", "start": 0.000, "end": 2.500 }, ...]
+"""
+
+import json
+import struct
+
+import numpy as np
+
+
+def word_entries(expected_words, start, end):
+    """
+    Build the output records from start/end arrays, rounding to the
+    millisecond. Ids are f000001, f000002, ...; missing or unknown
+    times become 0.
+    """
+    n = len(expected_words)
+    starts = np.zeros(n)
+    ends = np.zeros(n)
+    m = min(n, len(start))
+    starts[:m] = start[:m]
+    ends[:m] = end[:m]
+    starts = np.nan_to_num(np.round(starts, 3)).tolist()
+    ends = np.nan_to_num(np.round(ends, 3)).tolist()
+    return [
+        {
+            "id": f"f{str(i + 1).zfill(6)}",
+            "word": expected_word,
+            "start": starts[i],
+            "end": ends[i],
+        }
+        for i, expected_word in enumerate(expected_words)
+    ]
+
+
+def sentence_entries(sentences, start, end):
+    """Sentence records: [{ "id": "s000001", "text", "start", "end" }, ...]."""
+    starts = np.nan_to_num(np.round(start, 3)).tolist()
+    ends = np.nan_to_num(np.round(end, 3)).tolist()
+    return [
+        {"id": f"s{str(i + 1).zfill(6)}", "text": sentence, "start": starts[i], "end": ends[i]}
+        for i, sentence in enumerate(sentences)
+    ]
+
+
+def write_sentences(path, sentences, start, end):
+    """Write sentence_entries() as indented JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(sentence_entries(sentences, start, end), f, indent=2)
+
+
+def read_lines(path):
+    """Read a one-item-per-line text file, skipping blank lines."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def write_words(path, words):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(words, f, indent=2)
+
+
+FORMATS = ('json', 'bin', 'npy')
+
+BINARY_MAGIC = b'VXA1'
+_BINARY_HEADER = struct.Struct('<4sI')
+
+
+def write_binary(path, start, end):
+    """Write start/end as the bin format (unknown times become 0)."""
+    start = np.nan_to_num(np.asarray(start, dtype='<f4'))
+    end = np.nan_to_num(np.asarray(end, dtype='<f4'))
+    with open(path, 'wb') as f:
+        f.write(_BINARY_HEADER.pack(BINARY_MAGIC, len(start)))
+        f.write(start.tobytes())
+        f.write(end.tobytes())
+
+
+def read_binary(path):
+    """Memory-map a bin file; returns (start, end) read-only float32 arrays."""
+    with open(path, 'rb') as f:
+        magic, n = _BINARY_HEADER.unpack(f.read(_BINARY_HEADER.size))
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a voxalign binary file")
+    data = np.memmap(path, dtype='<f4', mode='r', offset=_BINARY_HEADER.size, shape=(2, n))
+    return data[0], data[1]
+
+
+def write_npy(path, start, end):
+    # Through a file object: np.save(path) would append .npy to other names
+    with open(path, 'wb') as f:
+        np.save(f, np.nan_to_num(np.stack([start, end]).astype('<f4')))
+
+
+def write_output(path, expected_words, start, end, fmt='json'):
+    """Write an alignment in one of FORMATS."""
+    if fmt == 'json':
+        write_words(path, word_entries(expected_words, start, end))
+    elif fmt == 'bin':
+        write_binary(path, start[:len(expected_words)], end[:len(expected_words)])
+    elif fmt == 'npy':
+        write_npy(path, start[:len(expected_words)], end[:len(expected_words)])
+    else:
+        raise ValueError(f"Unknown output format '{fmt}' (expected one of: {', '.join(FORMATS)})")
+
+
+def duration_of(end):
+    """End of the last word, as reported in the scripts' result line."""
+    return round(float(np.nan_to_num(end[-1])), 3) if len(end) else 0
@@ -0,0 +1,219 @@
+"""
+Timestamp post-processing shared by the alignment engines: filling in
+words the matcher could not place, closing the short silences between
+words, and spreading segment-level times over words.
+
+Timestamps are a pair of float arrays, start and end in seconds, with
+one entry per expected word; NaN marks a word that still needs a time.
+Records are only built when the result is written (see output.py).
+"""
+
+import numpy as np
+
+from .match import match_words
+
+# Default duration (s) given to words past the last known timestamp
+FALLBACK_WORD_DURATION = 0.15
+
+# Gaps shorter than this are closed; longer ones are real pauses
+MAX_CLOSED_GAP = 2.0
+
+
+def empty_times(n):
+    """start/end arrays of n unknown (NaN) times."""
+    return np.full(n, np.nan), np.full(n, np.nan)
+
+
+def to_arrays(timestamps):
+    """Convert a list of {"start", "end"} dicts (None = unknown) to start/end arrays."""
+    start, end = empty_times(len(timestamps))
+    for i, ts in enumerate(timestamps):
+        if ts is not None:
+            start[i] = ts["start"]
+            end[i] = ts["end"]
+    return start, end
+
+
+def interpolate_gaps(start, end):
+    """
+    Fill NaN entries in place by spreading each run of unknown words evenly
+    between the end of the previous known word (or 0) and the start of the
+    next one (or FALLBACK_WORD_DURATION per word past the last).
+    """
+    n = len(start)
+    unknown = np.isnan(start)
+    if not unknown.any():
+        return start, end
+
+    idx = np.arange(n)
+    # Nearest known word on each side of every position
+    prev = np.maximum.accumulate(np.where(unknown, -1, idx))
+    nxt = np.minimum.accumulate(np.where(unknown, n, idx)[::-1])[::-1]
+
+    u = idx[unknown]
+    p = prev[u]
+    q = nxt[u]
+    count = q - p - 1
+    k = u - p - 1
+
+    prev_end = np.where(p >= 0, end[np.maximum(p, 0)], 0.0)
+    next_start = np.where(q < n, start[np.minimum(q, n - 1)], prev_end + FALLBACK_WORD_DURATION * count)
+    dur = (next_start - prev_end) / count
+
+    start[u] = prev_end + k * dur
+    end[u] = prev_end + (k + 1) * dur
+    return start, end
+
+
+def close_gaps(start, end, max_gap=MAX_CLOSED_GAP):
+    """
+    Extend each word's end to the next word's start when the silence
+    between them is shorter than max_gap, so highlighting is continuous.
+    Same rule as WhisperXAligner._closeGaps on the Node side.
+    """
+    if len(start) < 2:
+        return start, end
+    gap = start[1:] - end[:-1]
+    # NaN gaps compare False, so unknown neighbours are left alone
+    close = (gap > 0) & (gap < max_gap)
+    end[:-1][close] = start[1:][close]
+    return start, end
+
+
+def align_to_expected(detected, expected_words, one_to_one=False):
+    """
+    Give every expected word a start/end from the detected words
+    ({"word", "start", "end"}), interpolating the ones that didn't match.
+    Returns (start, end) float arrays.
+
+    With one_to_one, equal word counts are taken as a 1:1 mapping without
+    looking at the text (edge-tts boundaries come from the same text).
+    """
+    n = len(expected_words)
+    if not detected:
+        # No words detected
+        return np.zeros(n), np.zeros(n)
+
+    if one_to_one and len(detected) == n:
+        start = np.array([w["start"] for w in detected], dtype=float)
+        end = np.array([w["end"] for w in detected], dtype=float)
+        return start, end
+
+    return interpolate_gaps(*match_words(detected, expected_words))
+
+
+def distribute_by_chars(words, span_start, span_end, span_index):
+    """
+    Spread spans over their words in proportion to character count, since
+    longer words take longer to say. span_index[i] is the span word i
+    belongs to; words of a span must be contiguous.
+    Returns (start, end) arrays.
+    """
+    chars = np.fromiter((max(len(w), 1) for w in words), dtype=float, count=len(words))
+    if not len(chars):
+        return np.zeros(0), np.zeros(0)
+    span_index = np.asarray(span_index)
+    cum = np.cumsum(chars)
+    before = cum - chars
+
+    # Character totals and offsets per span
+    totals = np.bincount(span_index, weights=chars, minlength=len(span_start))
+    first = np.searchsorted(span_index, np.arange(len(span_start)))
+    offset = np.concatenate(([0.0], cum))[first]
+
+    s0 = np.asarray(span_start, dtype=float)[span_index]
+    dur = (np.asarray(span_end, dtype=float) - np.asarray(span_start, dtype=float))[span_index]
+    total = np.maximum(totals, 1)[span_index]
+    within = before - offset[span_index]
+
+    start = s0 + dur * within / total
+    end = s0 + dur * (within + chars) / total
+    return start, end
+
+
+def distribute_segments_to_words(segments, expected_words):
+    """
+    Fallback: distribute segment-level timestamps proportionally
+    across expected words (used when word-level alignment fails).
+    Returns (start, end) arrays.
+    """
+    total_expected = len(expected_words)
+    if not segments or not expected_words:
+        i = np.arange(total_expected, dtype=float)
+        return i * 0.5, (i + 1) * 0.5
+
+    seg_start = np.array([seg.get("start", 0) for seg in segments], dtype=float)
+    seg_end = np.array([seg.get("end", seg.get("start", 0)) for seg in segments], dtype=float)
+    seg_word_counts = [max(len(seg.get("text", "").split()), 1) for seg in segments]
+    total_seg_words = sum(seg_word_counts)
+
+    # Words per segment, proportional to the segment's own word count
+    counts = []
+    remaining = total_expected
+    for seg_i, seg_count in enumerate(seg_word_counts):
+        if seg_i == len(segments) - 1:
+            n_words = remaining
+        else:
+            n_words = min(max(1, round(seg_count / total_seg_words * total_expected)), remaining)
+        counts.append(max(n_words, 0))
+        remaining -= counts[-1]
+
+    assigned = total_expected - remaining
+    span_index = np.repeat(np.arange(len(segments)), counts)
+    start, end = distribute_by_chars(expected_words[:assigned], seg_start, seg_end, span_index)
+
+    if remaining:
+        # Words beyond the last segment get 0.3s each
+        last_end = end[-1] if len(end) else 0.0
+        k = np.arange(remaining, dtype=float)
+        start = np.concatenate((start, last_end + 0.3 * k))
+        end = np.concatenate((end, last_end + 0.3 * (k + 1)))
+    return start, end
+
+
+def assign_to_windows(words, weights):
+    """
+    Hand words out to consecutive audio windows in proportion to each
+    window's weight (its seconds of speech), measuring text by characters:
+    at a steady reading rate the i-th window holds the words whose
+    character midpoint falls in its share. Returns the window index of
+    every word (non-decreasing).
+    """
+    if not len(words):
+        return np.zeros(0, dtype=int)
+    weights = np.asarray(weights, dtype=float)
+    chars = np.fromiter((max(len(w), 1) for w in words), dtype=float, count=len(words))
+    cum = np.cumsum(chars)
+    midpoint = (cum - chars / 2) / cum[-1]
+    share = np.cumsum(weights) / max(weights.sum(), 1e-9)
+    return np.minimum(np.searchsorted(share, midpoint, side='right'), len(weights) - 1)
+
+
+def sentence_words(sentences):
+    """
+    Split sentences into the word list they are aligned as. Returns
+    (words, counts) with counts[i] the number of words in sentence i.
+    """
+    words = []
+    counts = np.zeros(len(sentences), dtype=int)
+    for i, sentence in enumerate(sentences):
+        tokens = sentence.split() or [sentence]
+        words.extend(tokens)
+        counts[i] = len(tokens)
+    return words, counts
+
+
+def sentence_times(start, end, counts):
+    """
+    Sentence start/end from the times of their words: each sentence runs
+    from its first word's start to its last word's end, so boundaries sit
+    on detected word edges and the pause between sentences stays silent.
+    counts[i] is the (non-zero) word count of sentence i, words in order.
+    One pass over the words; returns (start, end) arrays.
+    """
+    if not len(counts):
+        return np.zeros(0), np.zeros(0)
+    first = np.cumsum(counts) - counts
+    sent_start = np.fmin.reduceat(start, first)
+    sent_end = np.fmax.reduceat(end, first)
+    return sent_start, np.fmax(sent_end, sent_start)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Speed and accuracy benchmark for the voxalign matcher against the greedy
+matcher it replaced in whisperx_align.py / stable_ts_align.py.
+
+Expected words come from the EPUBs bundled with the repo. A simulated ASR
+transcript is derived from them with known per-word times, then corrupted
+with dropped, inserted, substituted, split and merged words. Both matchers
+map the transcript back onto the expected words; a word counts as correct
+when its start is within --tolerance seconds of the true start.
+
+Usage:
+  python voxalign_benchmark.py --words 1000,10000,100000 --drop 0.02 --insert 0.02
+
+Output (JSON, stdout or --output), from a run with the default noise:
+  {
+    "books": ["pg154.epub", "pg78045.epub", "book.epub"],
+    "noise": { "drop": 0.02, "insert": 0.02, "substitute": 0.03, "split": 0.01, "merge": 0.01 },
+    "tolerance_s": 0.1,
+    "results": [
+      { "words": 100000, "detected": 98567,
+        "greedy": { "elapsed_s": 0.53, "accuracy": 0.0008, "mean_error_s": 266.495 },
+        "dp":     { "elapsed_s": 0.432, "accuracy": 0.9936, "mean_error_s": 0.003 } },
+      ...
+    ]
+  }
+
+The greedy matcher loses step at the first drop or insert it cannot
+resolve and never recovers, so its accuracy falls as chapters grow.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmark_corpus import DEFAULT_BOOKS, book_path, csv_list, extract_paragraphs
+from voxalign import interpolate_gaps, match_words, normalize, to_arrays
+
+FILLERS = ['uh', 'um', 'ah', 'the', 'and', 'so']
+
+
+def greedy_match(detected, expected):
+    """Reference copy of the greedy matcher (with its tail fill) that match_words replaced."""
+    total_exp = len(expected)
+    total_det = len(detected)
+    timestamps = [None] * total_exp
+    det_idx = 0
+    exp_idx = 0
+
+    while exp_idx < total_exp and det_idx < total_det:
+        exp_norm = normalize(expected[exp_idx])
+        det_word = detected[det_idx]
+        det_norm = normalize(det_word["word"])
+
+        if exp_norm == det_norm or exp_norm.startswith(det_norm) or det_norm.startswith(exp_norm):
+            timestamps[exp_idx] = {"start": det_word["start"], "end": det_word["end"]}
+            exp_idx += 1
+            det_idx += 1
+            continue
+
+        combined = det_norm
+        look_ahead = det_idx + 1
+        matched = False
+        while look_ahead < total_det and len(combined) < len(exp_norm) + 5:
+            combined += normalize(detected[look_ahead]["word"])
+            if combined == exp_norm or combined.startswith(exp_norm):
+                timestamps[exp_idx] = {"start": detected[det_idx]["start"], "end": detected[look_ahead]["end"]}
+                exp_idx += 1
+                det_idx = look_ahead + 1
+                matched = True
+                break
+            look_ahead += 1
+        if matched:
+            continue
+
+        exp_combined = exp_norm
+        exp_look = exp_idx + 1
+        matched = False
+        while exp_look < total_exp and len(exp_combined) < len(det_norm) + 5:
+            exp_combined += normalize(expected[exp_look])
+            if exp_combined == det_norm or exp_combined.startswith(det_norm):
+                count = exp_look - exp_idx + 1
+                dur = (det_word["end"] - det_word["start"]) / count
+                for k in range(count):
+                    timestamps[exp_idx + k] = {
+                        "start": round(det_word["start"] + k * dur, 3),
+                        "end": round(det_word["start"] + (k + 1) * dur, 3),
+                    }
+                exp_idx = exp_look + 1
+                det_idx += 1
+                matched = True
+                break
+            exp_look += 1
+        if matched:
+            continue
+
+        timestamps[exp_idx] = {"start": det_word["start"], "end": det_word["end"]}
+        exp_idx += 1
+        det_idx += 1
+
+    while exp_idx < total_exp:
+        if det_idx < total_det:
+            timestamps[exp_idx] = {"start": detected[det_idx]["start"], "end": detected[det_idx]["end"]}
+            det_idx += 1
+        exp_idx += 1
+    return timestamps
+
+
+def load_words(books, count):
+    """First `count` words of the books, repeating the text if it is too short."""
+    words = []
+    for book in books:
+        for paragraph in extract_paragraphs(book_path(book)):
+            words.extend(paragraph.split())
+    if not words:
+        raise SystemExit("No words found in the given books")
+    while len(words) < count:
+        words.extend(words[:count - len(words)])
+    return words[:count]
+
+
+def simulate_transcript(expected, noise, rng):
+    """
+    Give each expected word a true start time and build a noisy detected
+    word list from them. Returns (true_starts, detected).
+    """
+    true_starts = []
+    cursor = 0.0
+    spans = []
+    for word in expected:
+        dur = 0.08 + 0.06 * len(word)
+        true_starts.append(cursor)
+        spans.append((cursor, cursor + dur))
+        cursor += dur + 0.05
+
+    detected = []
+    i = 0
+    while i < len(expected):
+        word = expected[i]
+        start, end = spans[i]
+        r = rng.random()
+        if r < noise['drop']:
+            i += 1
+            continue
+        r -= noise['drop']
+        if r < noise['insert']:
+            detected.append({"word": rng.choice(FILLERS), "start": round(start - 0.04, 3), "end": round(start - 0.01, 3)})
+        elif r - noise['insert'] < noise['substitute']:
+            word = rng.choice(FILLERS) + 'x'
+        elif r - noise['insert'] - noise['substitute'] < noise['split'] and len(word) >= 6:
+            mid = len(word) // 2
+            half = (end - start) / 2
+            detected.append({"word": word[:mid], "start": round(start, 3), "end": round(start + half, 3)})
+            detected.append({"word": word[mid:], "start": round(start + half, 3), "end": round(end, 3)})
+            i += 1
+            continue
+        elif (r - noise['insert'] - noise['substitute'] - noise['split'] < noise['merge']
+              and i + 1 < len(expected)):
+            detected.append({"word": word + expected[i + 1], "start": round(start, 3), "end": round(spans[i + 1][1], 3)})
+            i += 2
+            continue
+        detected.append({"word": word, "start": round(start, 3), "end": round(end, 3)})
+        i += 1
+    return true_starts, detected
+
+
+def score(start, true_starts, tolerance):
+    errors = np.abs(start - np.asarray(true_starts))
+    return {
+        "accuracy": round(float(np.mean(errors <= tolerance)), 4),
+        "mean_error_s": round(float(np.mean(errors)), 3),
+    }
+
+
+def run_matcher(matcher, detected, expected, true_starts, tolerance):
+    t0 = time.perf_counter()
+    start, end = interpolate_gaps(*matcher(detected, expected))
+    elapsed = time.perf_counter() - t0
+    return {"elapsed_s": round(elapsed, 3), **score(start, true_starts, tolerance)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DP word matcher against the greedy one')
+    parser.add_argument('--books', type=csv_list(str), default=DEFAULT_BOOKS,
+                        help='EPUB files (relative to the repo root) to take words from')
+    parser.add_argument('--words', type=csv_list(int), default=[1000, 10000, 100000],
+                        help='Chapter sizes (expected words) to test')
+    parser.add_argument('--drop', type=float, default=0.02, help='Probability an expected word is not detected')
+    parser.add_argument('--insert', type=float, default=0.02, help='Probability of an extra detected word')
+    parser.add_argument('--substitute', type=float, default=0.03, help='Probability a word is misrecognized')
+    parser.add_argument('--split', type=float, default=0.01, help='Probability a long word is detected as two')
+    parser.add_argument('--merge', type=float, default=0.01, help='Probability two words are detected as one')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Start error (s) still counted as correct')
+    parser.add_argument('--band', type=int, help='DP band width (default: voxalign.match.DEFAULT_BAND)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    noise = {k: getattr(args, k) for k in ('drop', 'insert', 'substitute', 'split', 'merge')}
+    dp = match_words if args.band is None else (lambda d, e: match_words(d, e, band=args.band))
+    words = load_words(args.books, max(args.words))
+
+    results = []
+    for count in args.words:
+        print(f"BENCH:words={count}", file=sys.stderr, flush=True)
+        expected = words[:count]
+        true_starts, detected = simulate_transcript(expected, noise, random.Random(args.seed))
+        results.append({
+            "words": count,
+            "detected": len(detected),
+            "greedy": run_matcher(lambda d, e: to_arrays(greedy_match(d, e)), detected, expected, true_starts, args.tolerance),
+            "dp": run_matcher(dp, detected, expected, true_starts, args.tolerance),
+        })
+
+    report = json.dumps({
+        "books": args.books,
+        "noise": noise,
+        "tolerance_s": args.tolerance,
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
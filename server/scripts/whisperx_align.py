@@ -1,11 +1,25 @@
 """
-Word-level forced alignment using WhisperX.
+Word- and sentence-level forced alignment using WhisperX.
 
 Uses Whisper transcription + phoneme-level forced alignment via
 wav2vec2 / torchaudio to produce accurate per-word timestamps.
 
 Usage:
-  python whisperx_align.py <audio_path> <text_path> <output_json_path> [language] [model_size]
+  python whisperx_align.py <audio_path> <text_path> <output_json_path> [language] [model_size] [--format json|bin|npy]
+  python whisperx_align.py ... --mode sentence    (text_path holds sentences, output is sentence JSON)
+  python whisperx_align.py ... --mode both --sentences <sentences_path> --sentence-output <sentences_json_path>
+  python whisperx_align.py ... --workers 4 [--threads 2]    (parallel windowed transcription)
+  python whisperx_align.py ... --align-only    (no Whisper: align the known text directly)
+  python whisperx_align.py ... --previous <old_alignment.json> [--old-words <old_words_path>]
+      (after a text edit: re-align only the changed words, see voxalign/incremental.py)
+  python whisperx_align.py --serve [--socket /tmp/whisperx.sock]
+
+Daemon mode (--serve) keeps Whisper models (per size) and alignment models
+(per language) loaded in a small LRU and reads one NDJSON job per line:
+  { "id": 1, "audio": ..., "text": ..., "output": ..., "language": "en", "model_size": "base", "format": "json",
+    "cache": "alignment_cache.sqlite", "mode": "word" }
+Each job produces the usual {"progress": ...} lines and one result line,
+all tagged with the job's "id".
 
 Input:
   audio_path       - Path to audio file (MP3, WAV, FLAC, etc.)
@@ -20,296 +34,751 @@ Output (JSON):
     { "id": "f000002", "word": "quick", "start": 0.320, "end": 0.580 },
     ...
   ]
+  --format bin / npy write the same times as float32 arrays instead (see voxalign/output.py).
+
+  Sentence output (--mode sentence / both) is always JSON:
+  [
+    { "id": "s000001", "text": "The quick brown fox.", "start": 0.000, "end": 2.500 },
+    ...
+  ]
+
+Every mode transcribes the audio once, so word and sentence output for the
+same chapter never pay for Whisper twice.
+
+With --cache, transcriptions and alignments are stored per audio content
+hash (voxalign/cache.py): an unchanged job is answered from the cache and
+a text edit only re-runs matching. Decoded audio is always kept next to
+the source file (voxalign/audio.py), so no run decodes the same MP3 twice.
 """
 
+import argparse
+import gc
 import sys
 import json
+import multiprocessing
 import os
 import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Suppress unnecessary warnings
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+import numpy as np
 import whisperx
 import torch
 
+from voxalign import (
+    FORMATS,
+    SAMPLE_RATE,
+    align_to_expected,
+    assign_to_windows,
+    distribute_by_chars,
+    distribute_segments_to_words,
+    duration_of,
+    load_pcm,
+    open_pcm,
+    read_lines,
+    sentence_times,
+    sentence_words,
+    split_on_silence,
+    voiced_seconds,
+    write_output,
+    write_sentences,
+)
+from voxalign.cache import cache_key, open_cache, text_hash
+from voxalign.incremental import edit_windows, splice, stable_words
+
+MODES = ("word", "sentence", "both")
+
+# Window length (s) for align-only segments; wav2vec2 aligns each window in one pass
+ALIGN_WINDOW_SEC = 30.0
+
+# Incremental re-alignment falls back to a full run above this share of changed words
+MAX_REALIGN_FRACTION = 0.5
+
+
+class ModelCache:
+    """
+    Small LRU of loaded models. `loader(key)` is called on a miss; once more
+    than `capacity` models are resident the least recently used is dropped.
+    """
 
-def normalize(word):
-    """Strip punctuation and lowercase for fuzzy matching."""
-    return re.sub(r'[^\w]', '', word, flags=re.UNICODE).lower()
-
-
-def align_whisperx_words_to_expected(wx_words, expected_words):
+    def __init__(self, loader, capacity=1):
+        self.loader = loader
+        self.capacity = max(1, capacity)
+        self.models = OrderedDict()
+
+    def get(self, key):
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+        model = self.loader(key)
+        self.models[key] = model
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        return model
+
+    def __contains__(self, key):
+        return key in self.models
+
+
+class AlignModels:
+    """
+    Whisper models (per model size / language) and wav2vec2 alignment
+    models (per language) shared by every job in one process.
     """
-    Map WhisperX-detected words (with timestamps) to expected words
-    from the chapter HTML using greedy text matching.
 
-    Returns a list of { "start", "end" } for each expected word.
-    Words that couldn't be matched get interpolated timestamps.
+    def __init__(self, max_whisper=1, max_align=2):
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.compute_type = "float16" if self.device == "cuda" else "int8"
+        self.whisper = ModelCache(self._load_whisper, max_whisper)
+        self.align = ModelCache(self._load_align, max_align)
+        self._pool = None
+        self._pool_key = None
+
+    def pool(self, workers, threads):
+        """
+        Process pool for windowed transcription, kept between jobs so each
+        process loads its models once. Each process runs torch on `threads`
+        threads.
+        """
+        if self._pool_key != (workers, threads):
+            self.close()
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_window_worker,
+                initargs=(threads,),
+            )
+            self._pool_key = (workers, threads)
+        return self._pool
+
+    def close(self):
+        """Shut down the transcription pool, if one was started."""
+        if self._pool:
+            self._pool.shutdown()
+        self._pool = None
+        self._pool_key = None
+
+    def _load_whisper(self, key):
+        model_size, language = key
+        return whisperx.load_model(model_size, self.device, compute_type=self.compute_type, language=language)
+
+    def _load_align(self, language):
+        return whisperx.load_align_model(language_code=language, device=self.device)
+
+
+def emit(obj):
+    print(json.dumps(obj), flush=True)
+
+
+def load_audio(audio_path):
     """
-    total_exp = len(expected_words)
-    total_wx = len(wx_words)
-    timestamps = [None] * total_exp
-
-    if not wx_words:
-        # No words detected — distribute evenly over audio duration
-        return [{"start": 0, "end": 0} for _ in expected_words]
-
-    # Greedy alignment: walk both lists
-    wx_idx = 0
-    exp_idx = 0
-
-    while exp_idx < total_exp and wx_idx < total_wx:
-        exp_norm = normalize(expected_words[exp_idx])
-        wx_word = wx_words[wx_idx]
-        wx_norm = normalize(wx_word.get("word", ""))
-
-        # Direct match
-        if exp_norm == wx_norm or exp_norm.startswith(wx_norm) or wx_norm.startswith(exp_norm):
-            timestamps[exp_idx] = {
-                "start": wx_word.get("start", 0),
-                "end": wx_word.get("end", wx_word.get("start", 0)),
-            }
-            exp_idx += 1
-            wx_idx += 1
-            continue
+    16 kHz float32 audio via the decoded-PCM cache next to the file
+    (voxalign.load_pcm), so ffmpeg runs once per audio version.
+    Returns (audio, pcm_path); pcm_path is None if the cache is unwritable.
+    """
+    return load_pcm(audio_path, whisperx.load_audio)
+
+
+def transcribe(audio_path, language, model_size, models, emit=emit, audio=None):
+    """Run Whisper on the audio (decoded unless given); returns (segments, audio)."""
+    whisper_key = (model_size, language)
+    if whisper_key not in models.whisper:
+        emit({"progress": "loading_model", "message": "Loading WhisperX model..."})
+    model = models.whisper.get(whisper_key)
+    if audio is None:
+        audio, _ = load_audio(audio_path)
+    emit({"progress": "transcribing", "message": "Transcribing audio..."})
+    result = model.transcribe(audio, batch_size=16, language=language)
+    return result.get("segments", []), audio
 
-        # Check if expected word spans multiple WX words
-        combined = wx_norm
-        look_ahead = wx_idx + 1
-        matched = False
-        while look_ahead < total_wx and len(combined) < len(exp_norm) + 5:
-            combined += normalize(wx_words[look_ahead].get("word", ""))
-            if combined == exp_norm or combined.startswith(exp_norm):
-                timestamps[exp_idx] = {
-                    "start": wx_words[wx_idx].get("start", 0),
-                    "end": wx_words[look_ahead].get("end", wx_words[look_ahead].get("start", 0)),
-                }
-                exp_idx += 1
-                wx_idx = look_ahead + 1
-                matched = True
-                break
-            look_ahead += 1
-        if matched:
-            continue
 
-        # Check if WX word spans multiple expected words
-        exp_combined = exp_norm
-        exp_look = exp_idx + 1
-        matched = False
-        while exp_look < total_exp and len(exp_combined) < len(wx_norm) + 5:
-            exp_combined += normalize(expected_words[exp_look])
-            if exp_combined == wx_norm or exp_combined.startswith(wx_norm):
-                count = exp_look - exp_idx + 1
-                dur = (wx_word.get("end", 0) - wx_word.get("start", 0)) / count
-                for k in range(count):
-                    timestamps[exp_idx + k] = {
-                        "start": round(wx_word.get("start", 0) + k * dur, 3),
-                        "end": round(wx_word.get("start", 0) + (k + 1) * dur, 3),
-                    }
-                exp_idx = exp_look + 1
-                wx_idx += 1
-                matched = True
-                break
-            exp_look += 1
-        if matched:
-            continue
+# Models of one pool process (see AlignModels.pool)
+_window_models = None
 
-        # No match — assign WX word's timing and advance both
-        timestamps[exp_idx] = {
-            "start": wx_word.get("start", 0),
-            "end": wx_word.get("end", wx_word.get("start", 0)),
-        }
-        exp_idx += 1
-        wx_idx += 1
-
-    # Fill remaining expected words from remaining WX words or interpolation
-    while exp_idx < total_exp:
-        if wx_idx < total_wx:
-            wx_word = wx_words[wx_idx]
-            timestamps[exp_idx] = {
-                "start": wx_word.get("start", 0),
-                "end": wx_word.get("end", wx_word.get("start", 0)),
-            }
-            wx_idx += 1
-        else:
-            timestamps[exp_idx] = None  # will be interpolated below
-        exp_idx += 1
 
-    # Interpolate any None gaps
-    _interpolate_gaps(timestamps)
+def _init_window_worker(threads):
+    global _window_models
+    torch.set_num_threads(threads)
+    _window_models = AlignModels()
 
-    return timestamps
+
+def _transcribe_window(source, a, b, model_size, language):
+    """
+    Pool task: transcribe and force-align samples a:b of the chapter.
+    `source` is the decoded-PCM cache file, mapped rather than copied into
+    every process, or the window's own samples when there is no cache file.
+    Returns (segments, words) in chapter time; words is None if alignment
+    failed.
+    """
+    audio = open_pcm(source)[a:b] if isinstance(source, str) else source
+    offset = a / SAMPLE_RATE
+    model = _window_models.whisper.get((model_size, language))
+    segments = _plain_segments(model.transcribe(audio, batch_size=16, language=language).get("segments", []))
+    words = None
+    try:
+        align_model, align_metadata = _window_models.align.get(language)
+        aligned = whisperx.align(
+            segments, align_model, align_metadata, audio, _window_models.device,
+            return_char_alignments=False,
+        )
+        words = _aligned_words(aligned, offset)
+    except Exception:
+        pass
+    for seg in segments:
+        seg["start"] += offset
+        seg["end"] += offset
+    return segments, words
 
 
-def _interpolate_gaps(timestamps):
-    """Fill None entries by interpolating between known timestamps."""
-    n = len(timestamps)
-    # Forward fill: find runs of None and interpolate
-    i = 0
-    while i < n:
-        if timestamps[i] is not None:
-            i += 1
-            continue
-        # Find the run of Nones
-        start = i
-        while i < n and timestamps[i] is None:
-            i += 1
-        end = i  # first non-None after the run (or n)
-
-        # Get bounding timestamps
-        prev_end = timestamps[start - 1]["end"] if start > 0 and timestamps[start - 1] else 0
-        next_start = timestamps[end]["start"] if end < n and timestamps[end] else prev_end + 0.15 * (end - start)
-
-        gap = next_start - prev_end
-        count = end - start
-        dur = gap / count if count > 0 else 0.15
-
-        for k in range(count):
-            timestamps[start + k] = {
-                "start": round(prev_end + k * dur, 3),
-                "end": round(prev_end + (k + 1) * dur, 3),
-            }
+def transcribe_windows(audio_path, language, model_size, models, emit=emit, workers=2, threads=None):
+    """
+    Split the audio at pauses (voxalign.split_on_silence) and transcribe
+    and align the windows across `workers` processes. Returns
+    (segments, audio, words) in chapter time; words is None if no window
+    could be aligned.
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    audio, pcm_path = load_audio(audio_path)
+    windows = split_on_silence(audio)
+    if len(windows) == 1:
+        segments, audio = transcribe(audio_path, language, model_size, models, emit, audio=audio)
+        return segments, audio, None
+
+    emit({
+        "progress": "transcribing",
+        "message": f"Transcribing {len(windows)} windows on {workers} processes ({threads} threads each)..."
+    })
+    pool = models.pool(workers, threads)
+    futures = {
+        pool.submit(_transcribe_window, pcm_path or audio[a:b], a, b, model_size, language): i
+        for i, (a, b) in enumerate(windows)
+    }
+    results = [None] * len(windows)
+    for done, future in enumerate(as_completed(futures), 1):
+        results[futures[future]] = future.result()
+        emit({"progress": "transcribing", "message": f"Transcribed window {done}/{len(windows)}"})
+
+    segments = [seg for window_segments, _ in results for seg in window_segments]
+    if all(window_words is None for _, window_words in results):
+        return segments, audio, None
+    words = [w for _, window_words in results for w in (window_words or [])]
+    return segments, audio, words
+
+
+def load_transcript(audio_path, language, model_size, models, emit=emit, cache=None, audio_hash=None,
+                    workers=1, threads=None):
+    """
+    Segments for the audio, from the cache when possible. Returns
+    (segments, audio, words): audio is None when nothing had to be decoded,
+    words is the forced-aligned word list (cached, or from windowed
+    transcription with workers > 1) or None.
+    """
+    key = cache_key(audio_hash, "whisperx", model_size, language) if cache else None
+    transcript = cache.get("transcript", key) if cache else None
+    if transcript:
+        emit({"progress": "cached", "message": "Using cached transcription..."})
+        return transcript["segments"], None, transcript.get("words")
+
+    if workers > 1:
+        segments, audio, words = transcribe_windows(
+            audio_path, language, model_size, models, emit, workers=workers, threads=threads
+        )
+    else:
+        segments, audio = transcribe(audio_path, language, model_size, models, emit)
+        words = None
+    if cache:
+        cache.put("transcript", key, {"segments": _plain_segments(segments), "words": words})
+    return segments, audio, words
 
 
-def distribute_segments_to_words(segments, expected_words):
+def text_segments(audio, words):
     """
-    Fallback: distribute segment-level timestamps proportionally
-    across expected words (used when word-level alignment fails).
+    Segments for align-only mode, built from the known text instead of ASR:
+    the audio is split at pauses into ~ALIGN_WINDOW_SEC windows and each
+    window gets the words falling in its share of the speech
+    (voxalign.assign_to_windows). Windows without words are dropped.
     """
-    if not segments or not expected_words:
-        return [{"start": round(i * 0.5, 3), "end": round((i + 1) * 0.5, 3)} for i in range(len(expected_words))]
+    windows = split_on_silence(audio, target_sec=ALIGN_WINDOW_SEC)
+    index = assign_to_windows(words, voiced_seconds(audio, windows))
+    # First word of every window
+    bounds = np.searchsorted(index, np.arange(len(windows) + 1))
+    segments = []
+    for i, (a, b) in enumerate(windows):
+        if bounds[i] < bounds[i + 1]:
+            segments.append({
+                "start": a / SAMPLE_RATE,
+                "end": b / SAMPLE_RATE,
+                "text": " ".join(words[bounds[i]:bounds[i + 1]]),
+            })
+    return segments
 
-    timeline = []
-    seg_word_counts = []
-    for seg in segments:
-        seg_text = seg.get("text", "").strip()
-        seg_words = seg_text.split() if seg_text else []
-        timeline.append((seg.get("start", 0), seg.get("end", seg.get("start", 0))))
-        seg_word_counts.append(max(len(seg_words), 1))
-
-    total_seg_words = sum(seg_word_counts)
-    total_expected = len(expected_words)
-    timestamps = []
-    exp_idx = 0
-
-    for seg_i, (seg_start, seg_end) in enumerate(timeline):
-        if seg_i == len(timeline) - 1:
-            n_words = total_expected - exp_idx
-        else:
-            ratio = seg_word_counts[seg_i] / total_seg_words
-            n_words = max(1, round(ratio * total_expected))
-            n_words = min(n_words, total_expected - exp_idx)
 
-        if n_words <= 0:
-            continue
+def _plain_segments(segments):
+    return [{"start": s.get("start", 0), "end": s.get("end", s.get("start", 0)), "text": s.get("text", "")}
+            for s in segments]
 
-        # Proportional by character length
-        chunk = expected_words[exp_idx:exp_idx + n_words]
-        char_counts = [max(len(w), 1) for w in chunk]
-        total_chars = sum(char_counts) or 1
-        seg_dur = seg_end - seg_start
-        cursor = seg_start
-
-        for k in range(n_words):
-            word_dur = seg_dur * (char_counts[k] / total_chars)
-            timestamps.append({
-                "start": round(cursor, 3),
-                "end": round(cursor + word_dur, 3),
-            })
-            cursor += word_dur
-            exp_idx += 1
 
-    while exp_idx < total_expected:
-        last_end = timestamps[-1]["end"] if timestamps else 0.0
-        timestamps.append({"start": round(last_end, 3), "end": round(last_end + 0.3, 3)})
-        exp_idx += 1
+def _aligned_words(aligned, offset=0.0):
+    """Word-level timestamps from whisperx.align() output, shifted by offset seconds."""
+    words = []
+    for seg in aligned.get("segments", []):
+        for w in seg.get("words", []):
+            if "start" in w and "end" in w:
+                words.append({"word": w.get("word", ""), "start": w["start"] + offset, "end": w["end"] + offset})
+    return words
 
-    return timestamps
 
+def detect_words(audio_path, segments, audio, wx_words, language, model_size,
+                 models, emit=emit, cache=None, audio_hash=None):
+    """
+    Word-level forced alignment of the transcript via WhisperX align().
+    Returns the detected {"word", "start", "end"} list, reusing `wx_words`
+    when the cache already had it.
+    """
+    if wx_words is not None:
+        return wx_words
+
+    emit({"progress": "aligning", "message": "Loading alignment model..."})
+    align_model, align_metadata = models.align.get(language)
+    if audio is None:
+        audio, _ = load_audio(audio_path)
+    emit({"progress": "word_aligning", "message": "Running word-level forced alignment..."})
+    aligned = whisperx.align(
+        segments, align_model, align_metadata, audio, models.device,
+        return_char_alignments=False,
+    )
+
+    wx_words = _aligned_words(aligned)
+    if wx_words and cache:
+        cache.put("transcript", cache_key(audio_hash, "whisperx", model_size, language),
+                  {"segments": _plain_segments(segments), "words": wx_words})
+    return wx_words
+
+
+def word_times(segments, wx_words, expected_words, emit=emit, one_to_one=False):
+    """
+    Start/end arrays for the expected words: the detected words matched
+    onto them, or the segments distributed over them when there are none.
+    one_to_one takes equal word counts as a 1:1 mapping (align-only mode,
+    where the detected words are the expected text).
+    """
+    if wx_words:
+        emit({
+            "progress": "matching",
+            "message": f"Aligning {len(wx_words)} detected words to {len(expected_words)} expected words..."
+        })
+        return align_to_expected(wx_words, expected_words, one_to_one=one_to_one)
+    return distribute_segments_to_words(segments, expected_words)
 
-def main():
-    audio_path = sys.argv[1]
-    text_path = sys.argv[2]
-    output_path = sys.argv[3]
-    language = sys.argv[4] if len(sys.argv) > 4 else "en"
-    model_size = sys.argv[5] if len(sys.argv) > 5 else "base"
-
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    compute_type = "float16" if device == "cuda" else "int8"
-
-    with open(text_path, "r", encoding="utf-8") as f:
-        expected_words = [line.strip() for line in f if line.strip()]
-
-    # Step 1: Transcribe
-    print(json.dumps({"progress": "loading_model", "message": "Loading WhisperX model..."}), flush=True)
-    model = whisperx.load_model(model_size, device, compute_type=compute_type, language=language)
-    audio = whisperx.load_audio(audio_path)
-    print(json.dumps({"progress": "transcribing", "message": "Transcribing audio..."}), flush=True)
-    result = model.transcribe(audio, batch_size=16, language=language)
 
-    segments = result.get("segments", [])
-    used_word_align = False
+def align_file(audio_path, text_path, output_path, language="en", model_size="base",
+               models=None, emit=emit, fmt="json", cache=None,
+               mode="word", sentences_path=None, sentence_output=None, workers=1, threads=None,
+               align_only=False):
+    """
+    Align one audio file against its expected text and write the
+    timestamps to output_path. Progress lines go through `emit`; returns
+    the summary dict. Pass a shared AlignModels to reuse loaded models, and
+    an AlignmentCache to skip transcription (and alignment) of audio that
+    was seen before.
+
+    mode selects the outputs, all produced from a single transcription:
+      word     - text_path holds one word per line; word timestamps go to
+                 output_path in `fmt` (see voxalign.output).
+      sentence - text_path holds one sentence per line; sentence
+                 timestamps go to output_path as JSON. Each sentence spans
+                 its own aligned words.
+      both     - as word, plus the sentences in sentences_path written to
+                 sentence_output as JSON.
+
+    With workers > 1, long audio is split at pauses and the windows are
+    transcribed and aligned in parallel (see transcribe_windows), each
+    process using `threads` torch threads (default: cores / workers).
+
+    With align_only, Whisper is skipped: segments are built from the
+    expected text and the audio's pauses (see text_segments) and go
+    straight to wav2vec2 forced alignment. Use it when the audio reads
+    the text as written.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    if mode == "both" and not (sentences_path and sentence_output):
+        raise ValueError("mode 'both' needs sentences_path and sentence_output")
+
+    models = models or AlignModels()
+
+    if mode == "sentence":
+        sentences = read_lines(text_path)
+        sentence_output = output_path
+    else:
+        expected_words = read_lines(text_path)
+        sentences = read_lines(sentences_path) if mode == "both" else None
+    if sentences is not None:
+        tokens, counts = sentence_words(sentences)
+
+    audio_hash = cache.audio_hash(audio_path) if cache else None
+    engine = "whisperx-align" if align_only else "whisperx"
+
+    if mode == "word":
+        result_key = cache_key(audio_hash, text_hash(expected_words), engine, model_size, language) if cache else None
+        cached = cache.get("alignment", result_key) if cache else None
+        if cached:
+            emit({"progress": "cached", "message": "Using cached alignment..."})
+            start = np.array(cached["start"], dtype=float)
+            end = np.array(cached["end"], dtype=float)
+            write_output(output_path, expected_words, start, end, fmt)
+            return {
+                "success": True,
+                "wordCount": len(expected_words),
+                "transcribedWordCount": cached["transcribedWordCount"],
+                "usedWordAlign": cached["usedWordAlign"],
+                "duration": duration_of(end),
+                "format": fmt,
+                "cached": "alignment",
+            }
 
-    # Step 2: Try word-level forced alignment via WhisperX align()
-    try:
-        print(json.dumps({"progress": "aligning", "message": "Loading alignment model..."}), flush=True)
-        align_model, align_metadata = whisperx.load_align_model(
-            language_code=language, device=device
-        )
-        print(json.dumps({"progress": "word_aligning", "message": "Running word-level forced alignment..."}), flush=True)
-        aligned = whisperx.align(
-            segments, align_model, align_metadata, audio, device,
-            return_char_alignments=False,
+    # Step 1: Transcribe (or reuse the cached transcription), or segment the known text
+    if align_only:
+        emit({"progress": "segmenting", "message": "Splitting audio and text into alignment windows..."})
+        audio, _ = load_audio(audio_path)
+        segments = text_segments(audio, tokens if mode == "sentence" else expected_words)
+        wx_words = None
+        transcribed_count = 0
+        result = {"success": True, "transcribedWordCount": 0, "alignOnly": True}
+    else:
+        segments, audio, wx_words = load_transcript(
+            audio_path, language, model_size, models, emit, cache=cache, audio_hash=audio_hash,
+            workers=workers, threads=threads,
         )
+        transcribed_count = sum(len(s.get("text", "").split()) for s in segments)
+        result = {"success": True, "transcribedWordCount": transcribed_count}
+        if audio is None:
+            result["cached"] = "transcript"
 
-        # Extract word-level timestamps from aligned segments
-        wx_words = []
-        for seg in aligned.get("segments", []):
-            for w in seg.get("words", []):
-                if "start" in w and "end" in w:
-                    wx_words.append(w)
-
-        if wx_words:
-            print(json.dumps({
-                "progress": "matching",
-                "message": f"Aligning {len(wx_words)} detected words to {len(expected_words)} expected words..."
-            }), flush=True)
-            timestamps = align_whisperx_words_to_expected(wx_words, expected_words)
-            used_word_align = True
-        else:
+    # Step 2: Word-level forced alignment via WhisperX align()
+    try:
+        # Align-only words depend on the text, so they stay out of the transcript cache
+        wx_words = detect_words(
+            audio_path, segments, audio, wx_words, language, model_size,
+            models, emit, cache=None if align_only else cache, audio_hash=audio_hash,
+        )
+        if not wx_words:
             raise ValueError("No word-level timestamps from alignment")
-
     except Exception as e:
         # Fallback to segment-level distribution
-        print(json.dumps({
+        emit({
             "progress": "fallback",
             "message": f"Word alignment unavailable ({str(e)[:80]}), using segment distribution..."
-        }), flush=True)
-        timestamps = distribute_segments_to_words(segments, expected_words)
+        })
+        wx_words = None
+    result["usedWordAlign"] = bool(wx_words)
+
+    # Step 3: Match onto the expected words
+    if mode != "sentence":
+        start, end = word_times(segments, wx_words, expected_words, emit, one_to_one=align_only)
+        write_output(output_path, expected_words, start, end, fmt)
+
+        if mode == "word" and cache:
+            cache.put("alignment", result_key, {
+                "start": np.round(start, 3).tolist(),
+                "end": np.round(end, 3).tolist(),
+                "transcribedWordCount": transcribed_count,
+                "usedWordAlign": result["usedWordAlign"],
+            })
 
-    # Step 3: Build output
-    words = []
-    for i, expected_word in enumerate(expected_words):
-        ts = timestamps[i] if i < len(timestamps) else {"start": 0, "end": 0}
-        words.append({
-            "id": f"f{str(i + 1).zfill(6)}",
-            "word": expected_word,
-            "start": ts["start"],
-            "end": ts["end"],
+        result.update({
+            "wordCount": len(expected_words),
+            "duration": duration_of(end),
+            "format": fmt,
         })
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(words, f, indent=2)
+    # Step 4: Sentences span their aligned words
+    if sentences is not None:
+        if mode == "both" and tokens == expected_words:
+            token_start, token_end = start, end
+        else:
+            token_start, token_end = word_times(segments, wx_words, tokens, emit,
+                                                one_to_one=align_only and mode == "sentence")
+        sent_start, sent_end = sentence_times(token_start, token_end, counts)
+        write_sentences(sentence_output, sentences, sent_start, sent_end)
+        result["sentenceCount"] = len(sentences)
+
+    return result
 
-    transcribed_count = sum(len(s.get("text", "").split()) for s in segments)
-    print(json.dumps({
+
+def realign_file(audio_path, text_path, output_path, previous_path, old_words_path=None,
+                 language="en", model_size="base", models=None, emit=emit, fmt="json", cache=None,
+                 workers=1, threads=None, align_only=False):
+    """
+    Incremental alignment after a text edit: diff the edited words in
+    text_path against the previous alignment (JSON of {"word", "start",
+    "end"}, words optionally from old_words_path), force-align only the
+    audio around changed words and splice the result into the previous
+    times (see voxalign.incremental). No Whisper pass is needed, since the
+    text of every window is known. Falls back to align_file (with the same
+    align_only) when most of the chapter changed; the result's "incremental"
+    flag tells the two apart.
+    """
+    models = models or AlignModels()
+    new_words = read_lines(text_path)
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    old_words = read_lines(old_words_path) if old_words_path else [p.get("word", "") for p in previous]
+    if len(old_words) != len(previous):
+        raise ValueError("Old word list does not match the previous alignment")
+    old_start = np.array([np.nan if p.get("start") is None else p["start"] for p in previous], dtype=float)
+    old_end = np.array([np.nan if p.get("end") is None else p["end"] for p in previous], dtype=float)
+
+    old_index = stable_words(old_words, new_words, old_start, old_end)
+    windows = edit_windows(old_index, old_start, old_end)
+    sizes = np.array([hi - lo for lo, hi, _, _ in windows], dtype=int)
+    if sizes.sum() > len(new_words) * MAX_REALIGN_FRACTION:
+        emit({"progress": "fallback", "message": "Most of the text changed, running full alignment..."})
+        result = align_file(audio_path, text_path, output_path, language, model_size, models, emit, fmt,
+                            cache=cache, workers=workers, threads=threads, align_only=align_only)
+        result["incremental"] = False
+        return result
+
+    used_word_align = True
+    window_times = []
+    if windows:
+        emit({
+            "progress": "realigning",
+            "message": f"Re-aligning {sizes.sum()} words in {len(windows)} edited regions..."
+        })
+        audio, _ = load_audio(audio_path)
+        total = len(audio) / SAMPLE_RATE
+        seg_start = np.array([t0 for _, _, t0, _ in windows], dtype=float)
+        seg_end = np.array([total if t1 is None else t1 for _, _, _, t1 in windows], dtype=float)
+        region_words = [w for lo, hi, _, _ in windows for w in new_words[lo:hi]]
+        segments = [
+            {"start": float(seg_start[k]), "end": float(seg_end[k]), "text": " ".join(new_words[lo:hi])}
+            for k, (lo, hi, _, _) in enumerate(windows)
+        ]
+        span_index = np.repeat(np.arange(len(windows)), sizes)
+
+        try:
+            wx_words = detect_words(audio_path, segments, audio, None, language, model_size, models, emit)
+            if not wx_words:
+                raise ValueError("No word-level timestamps from alignment")
+            start, end = align_to_expected(wx_words, region_words, one_to_one=True)
+            # Keep every word inside its own window
+            start = np.clip(start, seg_start[span_index], seg_end[span_index])
+            end = np.clip(end, start, seg_end[span_index])
+        except Exception as e:
+            emit({
+                "progress": "fallback",
+                "message": f"Word alignment unavailable ({str(e)[:80]}), distributing edited regions..."
+            })
+            start, end = distribute_by_chars(region_words, seg_start, seg_end, span_index)
+            used_word_align = False
+        bounds = np.cumsum(sizes)[:-1]
+        window_times = list(zip(np.split(start, bounds), np.split(end, bounds)))
+
+    start, end = splice(old_index, old_start, old_end, windows, window_times)
+    write_output(output_path, new_words, start, end, fmt)
+    return {
         "success": True,
-        "wordCount": len(words),
-        "transcribedWordCount": transcribed_count,
+        "wordCount": len(new_words),
+        "realignedWordCount": int(sizes.sum()),
+        "editedRegions": len(windows),
         "usedWordAlign": used_word_align,
-        "duration": words[-1]["end"] if words else 0,
-    }))
+        "duration": duration_of(end),
+        "format": fmt,
+        "incremental": True,
+    }
+
+
+def run_job(job, models, emit=emit):
+    """
+    Run one daemon job and return its result line. Every line emitted for
+    the job (progress and result) carries the job's "id".
+
+    `job` fields: { "id", "audio", "text", "output", "language", "model_size", "format",
+                    "cache", "cache_max_mb", "mode", "sentences", "sentence_output",
+                    "workers", "threads", "align_only", "previous", "old_words" }
+
+    A job with "previous" (an earlier alignment JSON) runs realign_file.
+    """
+    job_id = job.get("id")
+
+    def emit_tagged(obj):
+        emit({**obj, "id": job_id} if job_id is not None else obj)
+
+    cache = None
+    try:
+        cache = open_cache(job.get("cache"), job.get("cache_max_mb"))
+        if job.get("previous"):
+            result = realign_file(
+                job["audio"], job["text"], job["output"], job["previous"], job.get("old_words"),
+                language=job.get("language") or "en",
+                model_size=job.get("model_size") or "base",
+                models=models, emit=emit_tagged, fmt=job.get("format") or "json",
+                cache=cache, workers=job.get("workers") or 1, threads=job.get("threads"),
+                align_only=bool(job.get("align_only")),
+            )
+        else:
+            result = align_file(
+                job["audio"], job["text"], job["output"],
+                language=job.get("language") or "en",
+                model_size=job.get("model_size") or "base",
+                models=models, emit=emit_tagged, fmt=job.get("format") or "json",
+                cache=cache, mode=job.get("mode") or "word",
+                sentences_path=job.get("sentences"), sentence_output=job.get("sentence_output"),
+                workers=job.get("workers") or 1, threads=job.get("threads"),
+                align_only=bool(job.get("align_only")),
+            )
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    finally:
+        if cache:
+            cache.close()
+    if job_id is not None:
+        result["id"] = job_id
+    return result
+
+
+# Job id of a line that is not valid JSON, so its error can still be routed
+JOB_ID_PATTERN = re.compile(r'"id"\s*:\s*(\d+)')
+
+
+def invalid_job(line, reason):
+    """Result line rejecting an unreadable job, tagged with its id when one can be found."""
+    result = {"success": False, "error": f"Invalid job: {reason}"}
+    match = JOB_ID_PATTERN.search(line)
+    if match:
+        result["id"] = int(match.group(1))
+    return result
+
+
+def serve(models, stdin=sys.stdin, emit=emit):
+    """
+    Daemon mode: read NDJSON jobs, one per line, and answer each with the
+    usual progress lines followed by a single result line. Models stay
+    loaded between jobs until the input is closed.
+    """
+    emit({"progress": "ready", "message": "Alignment worker ready"})
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            emit(invalid_job(line, e))
+            continue
+        if not isinstance(job, dict):
+            emit(invalid_job(line, "expected a JSON object"))
+            continue
+        emit(run_job(job, models, emit=emit))
+
+
+def serve_socket(models, socket_path):
+    """
+    Same protocol as serve(), over a Unix socket. Connections are handled
+    one at a time, so jobs never compete for the loaded models.
+    """
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def emit_conn(obj):
+                self.wfile.write((json.dumps(obj) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            lines = (raw.decode("utf-8") for raw in self.rfile)
+            try:
+                serve(models, stdin=lines, emit=emit_conn)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.UnixStreamServer(socket_path, Handler) as server:
+        emit({"progress": "listening", "message": f"Listening on {socket_path}"})
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Word- and sentence-level forced alignment using WhisperX")
+    parser.add_argument("audio_path", nargs="?")
+    parser.add_argument("text_path", nargs="?")
+    parser.add_argument("output_path", nargs="?")
+    parser.add_argument("language", nargs="?", default="en")
+    parser.add_argument("model_size", nargs="?", default="base")
+    parser.add_argument("--format", choices=FORMATS, default="json",
+                        help="Output format: json, or compact float32 start/end arrays (bin, npy)")
+    parser.add_argument("--mode", choices=MODES, default="word",
+                        help="Outputs to produce from one transcription: word, sentence or both (default: word)")
+    parser.add_argument("--sentences", help="With --mode both: text file with one sentence per line")
+    parser.add_argument("--sentence-output", help="With --mode both: where to write the sentence JSON")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Split long audio at pauses and transcribe the windows on this many processes")
+    parser.add_argument("--threads", type=int,
+                        help="Torch threads per --workers process (default: cores / workers)")
+    parser.add_argument("--align-only", action="store_true",
+                        help="Skip Whisper: force-align the known text directly against the audio")
+    parser.add_argument("--previous",
+                        help="Earlier alignment JSON of this audio: re-align only the words that changed since")
+    parser.add_argument("--old-words", help="With --previous: the word list it was aligned from (default: its words)")
+    parser.add_argument("--cache", help="SQLite transcription/alignment cache (reused across runs)")
+    parser.add_argument("--cache-max-mb", type=float, help="Cache size cap in MB (default: 256)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Daemon mode: keep models loaded and read NDJSON jobs from stdin")
+    parser.add_argument("--socket", help="With --serve: listen on this Unix socket instead of stdin")
+    parser.add_argument("--max-whisper-models", type=int, default=1,
+                        help="Whisper models kept loaded in daemon mode (default: 1)")
+    parser.add_argument("--max-align-models", type=int, default=2,
+                        help="Alignment models (one per language) kept loaded in daemon mode (default: 2)")
+    args = parser.parse_args()
+
+    if args.serve:
+        models = AlignModels(args.max_whisper_models, args.max_align_models)
+        try:
+            if args.socket:
+                serve_socket(models, args.socket)
+            else:
+                serve(models)
+        finally:
+            models.close()
+        return
+
+    if not (args.audio_path and args.text_path and args.output_path):
+        parser.error("audio_path, text_path and output_path are required")
+    if args.mode == "both" and not (args.sentences and args.sentence_output):
+        parser.error("--mode both requires --sentences and --sentence-output")
+    if args.previous and args.mode != "word":
+        parser.error("--previous only works in word mode")
+
+    models = AlignModels()
+    cache = open_cache(args.cache, args.cache_max_mb)
+    try:
+        if args.previous:
+            result = realign_file(args.audio_path, args.text_path, args.output_path,
+                                  args.previous, args.old_words,
+                                  language=args.language, model_size=args.model_size, models=models,
+                                  fmt=args.format, cache=cache, workers=args.workers, threads=args.threads,
+                                  align_only=args.align_only)
+        else:
+            result = align_file(args.audio_path, args.text_path, args.output_path,
+                                language=args.language, model_size=args.model_size, models=models,
+                                fmt=args.format, cache=cache, mode=args.mode, sentences_path=args.sentences,
+                                sentence_output=args.sentence_output, workers=args.workers, threads=args.threads,
+                                align_only=args.align_only)
+    finally:
+        models.close()
+        if cache:
+            cache.close()
+    print(json.dumps(result))
 
 
 if __name__ == "__main__":
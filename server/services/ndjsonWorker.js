@@ -0,0 +1,168 @@
+const { spawn } = require('child_process');
+
+let _nextJobId = 1;
+
+/**
+ * Resident Python worker speaking NDJSON: one long-lived `--serve` process
+ * that keeps its models loaded and handles jobs one at a time from a FIFO
+ * queue. Each job is written to stdin as one JSON line carrying an "id";
+ * the worker answers with lines tagged with that id, the last of which is
+ * the job's result.
+ *
+ * The process is started on the first job and shut down after `idleMs`
+ * without work. If it dies (crash, or killed after `jobTimeoutMs` on one
+ * job), only the job it was running is rejected; jobs still waiting are
+ * handed to a fresh process.
+ *
+ * Options:
+ *   name          - label for log lines and errors ("WhisperX", "NLLB")
+ *   launch()      - returns { command, args } for each new process
+ *   idleMs        - idle time before the process is stopped
+ *   jobTimeoutMs  - kill the process if one job runs longer (0 = no limit)
+ *   isResult(obj) - whether a tagged stdout line ends its job (default: all do);
+ *                   other tagged lines are passed to the job's onProgress
+ *   errorOf(obj)  - error message of a result line, or null on success
+ *   onStderrLine(line, onProgress) - optional stderr line handler for the running job
+ */
+class NdjsonWorker {
+  constructor(options) {
+    this.options = { isResult: () => true, jobTimeoutMs: 0, ...options };
+    this.worker = null;
+  }
+
+  /**
+   * Queue a job, starting the process on first use.
+   * Resolves with the job's result line.
+   */
+  run(payload, onProgress) {
+    return new Promise((resolve, reject) => {
+      this._enqueue([{ id: _nextJobId++, payload, onProgress, resolve, reject, timer: null }]);
+    });
+  }
+
+  _enqueue(jobs) {
+    if (!this.worker) this.worker = this._start();
+    this.worker.queue.push(...jobs);
+    this._dispatch(this.worker);
+  }
+
+  _start() {
+    const { name, launch } = this.options;
+    const { command, args } = launch();
+    const proc = spawn(command, args);
+    const worker = {
+      proc,
+      queue: [],
+      current: null,
+      stdoutBuf: '',
+      stderrBuf: '',
+      stderrTail: '',
+      idleTimer: null,
+      timedOut: false,
+      dead: false,
+    };
+
+    proc.stdout.on('data', (chunk) => {
+      worker.stdoutBuf += chunk.toString();
+      const lines = worker.stdoutBuf.split('\n');
+      worker.stdoutBuf = lines.pop(); // keep incomplete line in buffer
+      for (const line of lines) this._handleLine(worker, line);
+    });
+
+    proc.stderr.on('data', (chunk) => {
+      const text = chunk.toString();
+      worker.stderrTail = (worker.stderrTail + text).slice(-2000);
+      if (!this.options.onStderrLine) return;
+      worker.stderrBuf += text;
+      const lines = worker.stderrBuf.split('\n');
+      worker.stderrBuf = lines.pop();
+      for (const line of lines) {
+        if (worker.current) this.options.onStderrLine(line, worker.current.onProgress);
+      }
+    });
+
+    proc.on('close', (code) => {
+      const reason = worker.timedOut
+        ? `${name} job timed out after ${this.options.jobTimeoutMs / 1000}s`
+        : `${name} worker exited with code ${code}: ${worker.stderrTail.slice(-500)}`;
+      this._fail(worker, new Error(reason));
+    });
+    proc.on('error', (err) => this._fail(worker, err));
+    proc.stdin.on('error', () => { /* surfaced through 'close' */ });
+
+    return worker;
+  }
+
+  _handleLine(worker, line) {
+    const trimmed = line.trim();
+    if (!trimmed) return;
+    let obj;
+    try {
+      obj = JSON.parse(trimmed);
+    } catch {
+      console.log(`${this.options.name}:`, trimmed);
+      return;
+    }
+    const job = worker.current;
+    if (!job || obj.id !== job.id) return;
+    if (!this.options.isResult(obj)) {
+      if (job.onProgress) job.onProgress(obj);
+      return;
+    }
+    clearTimeout(job.timer);
+    worker.current = null;
+    const error = this.options.errorOf(obj);
+    if (error) job.reject(new Error(error));
+    else job.resolve(obj);
+    this._dispatch(worker);
+  }
+
+  _dispatch(worker) {
+    if (worker.current || worker.dead) return;
+    const job = worker.queue.shift();
+    if (!job) {
+      clearTimeout(worker.idleTimer);
+      worker.idleTimer = setTimeout(() => {
+        if (this.worker === worker && !worker.current && !worker.queue.length) {
+          this.worker = null;
+          worker.proc.stdin.end();
+        }
+      }, this.options.idleMs);
+      worker.idleTimer.unref?.();
+      return;
+    }
+    clearTimeout(worker.idleTimer);
+    worker.current = job;
+    if (this.options.jobTimeoutMs) {
+      job.timer = setTimeout(() => {
+        worker.timedOut = true;
+        worker.proc.kill();
+      }, this.options.jobTimeoutMs);
+    }
+    worker.proc.stdin.write(JSON.stringify({ id: job.id, ...job.payload }) + '\n');
+  }
+
+  /**
+   * The process is gone: reject the job it was running and move the jobs
+   * that never started to a new process.
+   */
+  _fail(worker, err) {
+    if (worker.dead) return;
+    worker.dead = true;
+    if (this.worker === worker) this.worker = null;
+    clearTimeout(worker.idleTimer);
+
+    const job = worker.current;
+    worker.current = null;
+    if (job) {
+      clearTimeout(job.timer);
+      job.reject(err);
+    }
+
+    const waiting = worker.queue;
+    worker.queue = [];
+    if (waiting.length) this._enqueue(waiting);
+  }
+}
+
+module.exports = NdjsonWorker;
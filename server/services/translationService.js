@@ -1,9 +1,10 @@
 const path = require('path');
 const os = require('os');
 const fs = require('fs').promises;
-const { execSync, spawn } = require('child_process');
+const { execSync } = require('child_process');
 const cheerio = require('cheerio');
 const wordWrapper = require('./wordWrapper');
+const NdjsonWorker = require('./ndjsonWorker');
 
 /**
  * Detect the correct Python command for the current OS.
@@ -66,76 +67,94 @@ function isRTL(lang) {
   return rtl.includes(shortLang(lang));
 }
 
+const NLLB_SCRIPT = path.join(__dirname, '..', 'scripts', 'nllb_translate.py');
+
+const TRANSLATION_MEMORY_FILE = 'translation_memory.sqlite';
+
+// Shut the resident NLLB worker down after this long without jobs (frees ~1.2GB)
+const WORKER_IDLE_MS = parseInt(process.env.NLLB_WORKER_IDLE_MS || '600000', 10);
+
+// Kill the worker if a single job runs longer than this, so a hung generate
+// cannot hold up every translation queued behind it
+const JOB_TIMEOUT_MS = parseInt(process.env.NLLB_JOB_TIMEOUT_MS || '1800000', 10);
+
+/**
+ * Parse a "PROGRESS:current/total/percent" stderr line from nllb_translate.py.
+ */
+function parseProgressLine(line) {
+  const match = line.match(/PROGRESS:(\d+)\/(\d+)\/(\d+)/);
+  if (!match) return null;
+  return {
+    current: parseInt(match[1]),
+    total: parseInt(match[2]),
+    percent: parseInt(match[3]),
+  };
+}
+
+/**
+ * Persistent NLLB worker: a single `nllb_translate.py --serve` process that
+ * keeps the model loaded between jobs (see ndjsonWorker.js). Each answer is
+ * one stdout line; progress arrives on stderr as PROGRESS lines.
+ */
+function workerArgs() {
+  const args = [NLLB_SCRIPT, '--serve'];
+  if (process.env.NLLB_BATCH_TOKENS) args.push('--batch-tokens', process.env.NLLB_BATCH_TOKENS);
+  // torch | torch-int8 | ctranslate2 — quantized backends are much faster on CPU-only hosts
+  if (process.env.NLLB_BACKEND) args.push('--backend', process.env.NLLB_BACKEND);
+  // Spread batches over several processes on many-core hosts
+  if (process.env.NLLB_WORKERS) args.push('--workers', process.env.NLLB_WORKERS);
+  if (process.env.NLLB_THREADS) args.push('--threads', process.env.NLLB_THREADS);
+  // default | fast | quality — "fast" trades a little quality for much lower latency on bulk jobs
+  if (process.env.NLLB_PRESET) args.push('--preset', process.env.NLLB_PRESET);
+  return args;
+}
+
+const translationWorker = new NdjsonWorker({
+  name: 'NLLB',
+  launch: () => ({ command: getPythonCmd(), args: workerArgs() }),
+  idleMs: WORKER_IDLE_MS,
+  jobTimeoutMs: JOB_TIMEOUT_MS,
+  errorOf: (obj) => obj.error || null,
+  onStderrLine: (line, onProgress) => {
+    const progress = parseProgressLine(line);
+    if (progress && onProgress) onProgress(progress);
+  },
+});
+
+function runWorkerJob(payload, onProgress) {
+  return translationWorker.run(payload, onProgress);
+}
+
 /**
  * Translate an array of paragraphs using NLLB via Python script (JSON mode).
- * Loads the model ONCE and translates all paragraphs in a single process.
+ * Jobs run on a persistent worker process, so the model is loaded once
+ * and reused across chapters and languages.
  *
  * @param {string[]} paragraphs - Array of plain text paragraphs
  * @param {string} srcLang - Source language code (e.g. "en", "en-US")
  * @param {string} tgtLang - Target language code (e.g. "ja", "ja-JP")
- * @param {string} tmpDir - Directory for temp files
+ * @param {string} tmpDir - Book storage directory; holds the translation memory
+ *   (translation_memory.sqlite) that lets repeated sentences skip the model
  * @param {function} [onProgress] - Optional callback: onProgress({ current, total, percent })
  * @returns {string[]} Array of translated paragraphs
  */
 async function translateParagraphs(paragraphs, srcLang, tgtLang, tmpDir, onProgress) {
-  const ts = Date.now();
+  const ts = `${Date.now()}_${Math.random().toString(36).slice(2, 8)}`;
   const tempBase = os.tmpdir();
   const inputPath = path.join(tempBase, `_translate_in_${ts}.json`);
   const outputPath = path.join(tempBase, `_translate_out_${ts}.json`);
 
   await fs.writeFile(inputPath, JSON.stringify(paragraphs), 'utf-8');
 
-  const scriptPath = path.join(__dirname, '..', 'scripts', 'nllb_translate.py');
-
   try {
-    const result = await new Promise((resolve, reject) => {
-      const proc = spawn(getPythonCmd(), [
-        scriptPath,
-        '--input', inputPath,
-        '--output', outputPath,
-        '--src', srcLang,
-        '--tgt', tgtLang,
-        '--json',
-      ]);
-
-      let stdout = '';
-      let stderrBuf = '';
-      let stderrFull = '';
-
-      proc.stdout.on('data', (data) => { stdout += data.toString(); });
-
-      proc.stderr.on('data', (data) => {
-        const chunk = data.toString();
-        stderrBuf += chunk;
-        stderrFull += chunk;
-        // Parse progress lines: PROGRESS:current/total/percent
-        const lines = stderrBuf.split('\n');
-        stderrBuf = lines.pop(); // keep incomplete line in buffer
-        for (const line of lines) {
-          const match = line.match(/PROGRESS:(\d+)\/(\d+)\/(\d+)/);
-          if (match && onProgress) {
-            onProgress({
-              current: parseInt(match[1]),
-              total: parseInt(match[2]),
-              percent: parseInt(match[3]),
-            });
-          }
-        }
-      });
-
-      proc.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Translation script exited with code ${code}. stderr: ${stderrFull.slice(-500)}`));
-        } else {
-          resolve(stdout);
-        }
-      });
-
-      proc.on('error', reject);
-    });
-
-    const parsed = JSON.parse(result.trim().split('\n').pop());
-    if (parsed.error) throw new Error(parsed.error);
+    await runWorkerJob({
+      input: inputPath,
+      output: outputPath,
+      src: srcLang,
+      tgt: tgtLang,
+      json: true,
+      cache: tmpDir ? path.join(tmpDir, TRANSLATION_MEMORY_FILE) : undefined,
+    }, onProgress);
 
     const translated = JSON.parse(await fs.readFile(outputPath, 'utf-8'));
     return translated;
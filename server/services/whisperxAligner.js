@@ -2,6 +2,7 @@ const { spawn } = require('child_process');
 const fs = require('fs').promises;
 const path = require('path');
 const os = require('os');
+const NdjsonWorker = require('./ndjsonWorker');
 
 // Use PYTHON_PATH from .env, or fall back to platform default
 const PYTHON = process.env.PYTHON_PATH
@@ -11,10 +12,11 @@ const PYTHON = process.env.PYTHON_PATH
  * Run a Python script via spawn, streaming stdout line-by-line.
  * Lines that are valid JSON with a "progress" key trigger onProgress.
  * Returns the final JSON result line (the one with "success" key).
+ * Pass cwd: SCRIPTS_DIR to run package modules (e.g. ['-m', 'voxalign', ...]).
  */
-function runPythonWithProgress(args, { timeout = 900000, onProgress } = {}) {
+function runPythonWithProgress(args, { timeout = 900000, onProgress, cwd } = {}) {
   return new Promise((resolve, reject) => {
-    const proc = spawn(PYTHON, args, { timeout });
+    const proc = spawn(PYTHON, args, { timeout, cwd });
     let stdoutBuf = '';
     let stderrBuf = '';
     let lastResult = null;
@@ -72,6 +74,72 @@ function runPythonWithProgress(args, { timeout = 900000, onProgress } = {}) {
 }
 
 
+const BINARY_MAGIC = 'VXA1';
+const BINARY_HEADER_BYTES = 8;
+
+/**
+ * Read an alignment written with --format bin (see scripts/voxalign/output.py):
+ * "VXA1", uint32 word count n, float32 start[n], float32 end[n], little-endian.
+ * The times are viewed in place as Float32Arrays instead of parsing JSON.
+ * Returns [{ word, start, end }] for the expected words, in order.
+ */
+async function readBinaryAlignment(filePath, words) {
+  const buf = await fs.readFile(filePath);
+  if (buf.length < BINARY_HEADER_BYTES || buf.toString('latin1', 0, 4) !== BINARY_MAGIC) {
+    throw new Error(`${filePath} is not a voxalign binary alignment`);
+  }
+  const count = buf.readUInt32LE(4);
+  const byteOffset = buf.byteOffset + BINARY_HEADER_BYTES;
+  // Float32Array views need 4-byte alignment; copy only if the Buffer is pooled off-alignment
+  const times = byteOffset % 4 === 0
+    ? new Float32Array(buf.buffer, byteOffset, count * 2)
+    : new Float32Array(buf.buffer.slice(byteOffset, byteOffset + count * 8));
+  const start = times.subarray(0, count);
+  const end = times.subarray(count);
+  return words.map((word, i) => ({
+    word,
+    start: i < count ? Math.round(start[i] * 1000) / 1000 : 0,
+    end: i < count ? Math.round(end[i] * 1000) / 1000 : 0,
+  }));
+}
+
+const SCRIPTS_DIR = path.join(__dirname, '..', 'scripts');
+
+// Per-book transcription/alignment cache (see scripts/voxalign/cache.py)
+const ALIGNMENT_CACHE_FILE = 'alignment_cache.sqlite';
+
+function cachePath(cacheDir) {
+  return cacheDir ? path.join(cacheDir, ALIGNMENT_CACHE_FILE) : undefined;
+}
+const WHISPERX_SCRIPT = path.join(SCRIPTS_DIR, 'whisperx_align.py');
+
+// Shut the resident WhisperX worker down after this long without jobs (frees the models)
+const WORKER_IDLE_MS = parseInt(process.env.WHISPERX_WORKER_IDLE_MS || '600000', 10);
+
+// Processes the worker splits long audio across (windowed transcription; 1 = single pass)
+const TRANSCRIBE_WORKERS = parseInt(process.env.WHISPERX_TRANSCRIBE_WORKERS || '1', 10);
+
+// Kill the worker if a single job runs longer than this (same limit as one-shot runs)
+const JOB_TIMEOUT_MS = 900000;
+
+/**
+ * Persistent alignment worker: a single `whisperx_align.py --serve` process
+ * that keeps Whisper and alignment models loaded between jobs (see
+ * ndjsonWorker.js). Progress and result lines come back tagged with the job id.
+ */
+const alignWorker = new NdjsonWorker({
+  name: 'WhisperX',
+  launch: () => ({ command: PYTHON, args: [WHISPERX_SCRIPT, '--serve'] }),
+  idleMs: WORKER_IDLE_MS,
+  jobTimeoutMs: JOB_TIMEOUT_MS,
+  isResult: (obj) => obj.success !== undefined,
+  errorOf: (obj) => (obj.success ? null : obj.error || 'Alignment failed'),
+});
+
+function runWorkerJob(payload, onProgress) {
+  return alignWorker.run(payload, onProgress);
+}
+
 class WhisperXAligner {
 
   /**
@@ -79,10 +147,11 @@ class WhisperXAligner {
    * The timing JSON contains exact WordBoundary events from the TTS engine:
    *   [{ "word": "Hello", "start": 0.05, "end": 0.275 }, ...]
    *
-   * These are mapped to the chapter's word IDs. When word counts match,
-   * we get a perfect 1:1 mapping. When they differ (HTML splitting
-   * differs from TTS word splitting), we use a greedy text-matching
-   * alignment to preserve timing accuracy.
+   * These are mapped to the chapter's word IDs by the shared voxalign
+   * matcher (server/scripts/voxalign). When word counts match, we get a
+   * perfect 1:1 mapping. When they differ (HTML splitting differs from TTS
+   * word splitting, e.g. "don't" vs ["don", "'t"]), words are aligned by
+   * text so timing stays accurate.
    *
    * @param {string} timingPath - Path to the _timing.json file
    * @param {string[]} expectedWords - Words from the chapter HTML
@@ -90,183 +159,69 @@ class WhisperXAligner {
    * @returns {Array<{ id, word, clipBegin, clipEnd }>}
    */
   async buildSyncFromTiming(timingPath, expectedWords, wordIds) {
-    const raw = await fs.readFile(timingPath, 'utf-8');
-    const ttsWords = JSON.parse(raw);
-
+    const ttsWords = JSON.parse(await fs.readFile(timingPath, 'utf-8'));
     if (!ttsWords.length) return null;
 
-    const totalExpected = expectedWords.length;
-    const totalTts = ttsWords.length;
-    const syncData = [];
-
-    if (totalTts === totalExpected) {
-      // Perfect 1:1 match — use TTS timing directly
-      for (let i = 0; i < totalExpected; i++) {
-        syncData.push({
-          id: wordIds[i] || 'w' + String(i + 1).padStart(5, '0'),
-          word: expectedWords[i],
-          clipBegin: ttsWords[i].start,
-          clipEnd: ttsWords[i].end,
-        });
-      }
-      this._closeGaps(syncData);
-      return syncData;
-    }
-
-    // Word counts differ — align by greedy text matching.
-    // Both lists come from the same source text, but may split differently
-    // (e.g. "don't" vs ["don", "'t"], or punctuation handling).
-    // Walk both lists, consuming TTS words as they match expected words.
-    let ttsIdx = 0;
-    let expIdx = 0;
-
-    while (expIdx < totalExpected && ttsIdx < totalTts) {
-      const expWord = expectedWords[expIdx];
-      const ttsWord = ttsWords[ttsIdx];
-
-      // Simple case: words match (possibly with punctuation differences)
-      const expNorm = expWord.replace(/[^\p{L}\p{N}]/gu, '').toLowerCase();
-      const ttsNorm = ttsWord.word.replace(/[^\p{L}\p{N}]/gu, '').toLowerCase();
-
-      if (expNorm === ttsNorm || expNorm.startsWith(ttsNorm) || ttsNorm.startsWith(expNorm)) {
-        // Direct match — use this TTS word's timing
-        syncData.push({
-          id: wordIds[expIdx] || 'w' + String(expIdx + 1).padStart(5, '0'),
-          word: expWord,
-          clipBegin: ttsWord.start,
-          clipEnd: ttsWord.end,
-        });
-        expIdx++;
-        ttsIdx++;
-        continue;
-      }
+    const tmpDir = path.join(os.tmpdir(), `voxalign_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`);
+    await fs.mkdir(tmpDir, { recursive: true });
 
-      // Check if the expected word spans multiple TTS words (e.g. expected="don't", tts=["don", "'t"])
-      let combined = ttsNorm;
-      let lookAhead = ttsIdx + 1;
-      let matched = false;
-      while (lookAhead < totalTts && combined.length < expNorm.length + 5) {
-        combined += ttsWords[lookAhead].word.replace(/[^\p{L}\p{N}]/gu, '').toLowerCase();
-        if (combined === expNorm || combined.startsWith(expNorm)) {
-          // Expected word spans ttsIdx..lookAhead
-          syncData.push({
-            id: wordIds[expIdx] || 'w' + String(expIdx + 1).padStart(5, '0'),
-            word: expWord,
-            clipBegin: ttsWords[ttsIdx].start,
-            clipEnd: ttsWords[lookAhead].end,
-          });
-          expIdx++;
-          ttsIdx = lookAhead + 1;
-          matched = true;
-          break;
-        }
-        lookAhead++;
-      }
-      if (matched) continue;
-
-      // Check if the TTS word spans multiple expected words (e.g. tts="don't", expected=["don", "'t"])
-      let expCombined = expNorm;
-      let expLookAhead = expIdx + 1;
-      matched = false;
-      while (expLookAhead < totalExpected && expCombined.length < ttsNorm.length + 5) {
-        expCombined += expectedWords[expLookAhead].replace(/[^\p{L}\p{N}]/gu, '').toLowerCase();
-        if (expCombined === ttsNorm || expCombined.startsWith(ttsNorm)) {
-          // TTS word covers expIdx..expLookAhead
-          const count = expLookAhead - expIdx + 1;
-          const dur = (ttsWord.end - ttsWord.start) / count;
-          for (let k = 0; k < count; k++) {
-            syncData.push({
-              id: wordIds[expIdx + k] || 'w' + String(expIdx + k + 1).padStart(5, '0'),
-              word: expectedWords[expIdx + k],
-              clipBegin: Math.round((ttsWord.start + k * dur) * 1000) / 1000,
-              clipEnd: Math.round((ttsWord.start + (k + 1) * dur) * 1000) / 1000,
-            });
-          }
-          expIdx = expLookAhead + 1;
-          ttsIdx++;
-          matched = true;
-          break;
-        }
-        expLookAhead++;
-      }
-      if (matched) continue;
-
-      // No match found — assign this TTS word's timing to the expected word and advance both
-      syncData.push({
-        id: wordIds[expIdx] || 'w' + String(expIdx + 1).padStart(5, '0'),
-        word: expWord,
-        clipBegin: ttsWord.start,
-        clipEnd: ttsWord.end,
-      });
-      expIdx++;
-      ttsIdx++;
-    }
+    const textPath = path.join(tmpDir, 'words.txt');
+    await fs.writeFile(textPath, expectedWords.join('\n'));
+    const outputPath = path.join(tmpDir, 'alignment.bin');
 
-    // Fill any remaining expected words from the last known timestamp
-    while (expIdx < totalExpected) {
-      const lastEnd = syncData.length ? syncData[syncData.length - 1].clipEnd : 0;
-      // If there are remaining TTS words, use them
-      if (ttsIdx < totalTts) {
-        syncData.push({
-          id: wordIds[expIdx] || 'w' + String(expIdx + 1).padStart(5, '0'),
-          word: expectedWords[expIdx],
-          clipBegin: ttsWords[ttsIdx].start,
-          clipEnd: ttsWords[ttsIdx].end,
-        });
-        ttsIdx++;
-      } else {
-        syncData.push({
-          id: wordIds[expIdx] || 'w' + String(expIdx + 1).padStart(5, '0'),
-          word: expectedWords[expIdx],
-          clipBegin: lastEnd,
-          clipEnd: Math.round((lastEnd + 0.15) * 1000) / 1000,
-        });
-      }
-      expIdx++;
+    try {
+      // Close gaps: edge-tts WordBoundary durations only cover phonetic
+      // pronunciation, leaving gaps between words where no highlight is
+      // active. Closing them gives continuous karaoke-style highlighting.
+      await runPythonWithProgress(
+        ['-m', 'voxalign', path.resolve(timingPath), textPath, outputPath,
+          '--one-to-one', '--close-gaps', '--format', 'bin'],
+        { timeout: 120000, cwd: SCRIPTS_DIR }
+      );
+      const timestamps = await readBinaryAlignment(outputPath, expectedWords);
+      return this.buildSyncData(timestamps, wordIds);
+    } finally {
+      await fs.rm(tmpDir, { recursive: true, force: true });
     }
-
-    // Close gaps: extend each word's clipEnd to the next word's clipBegin.
-    // Edge-tts WordBoundary durations only cover phonetic pronunciation,
-    // leaving gaps between words where no highlight is active. Extending
-    // clipEnd ensures continuous karaoke-style highlighting that tracks
-    // the actual pace of speech (longer words when voice pauses longer,
-    // shorter words when voice speaks quickly).
-    this._closeGaps(syncData);
-
-    return syncData;
   }
 
   /**
    * Perform word-level alignment using WhisperX.
    * Fallback for uploaded (non-TTS) audio where no VTT exists.
+   * Runs on the persistent worker, so models load once per process.
+   * With options.cacheDir (the book's storage directory), transcriptions are
+   * cached by audio content, so re-syncing unchanged audio skips Whisper.
+   * With options.alignOnly, Whisper is skipped and the known words are
+   * force-aligned directly (for audio that reads the text as written).
    */
   async alignWords(audioPath, words, options = {}) {
-    const { language = 'en', modelSize = 'base', onProgress } = options;
+    const { language = 'en', modelSize = 'base', onProgress, cacheDir, alignOnly = false } = options;
 
-    const tmpDir = path.join(os.tmpdir(), 'whisperx_' + Date.now());
+    // Jobs queue on one worker, so concurrent calls must not share a directory
+    const tmpDir = path.join(os.tmpdir(), `whisperx_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`);
     await fs.mkdir(tmpDir, { recursive: true });
 
     // WhisperX script expects one word per line
     const textPath = path.join(tmpDir, 'words.txt');
     await fs.writeFile(textPath, words.join('\n'));
 
-    const outputPath = path.join(tmpDir, 'alignment.json');
-
-    const scriptPath = path.join(
-      __dirname, '..', 'scripts', 'whisperx_align.py'
-    );
+    const outputPath = path.join(tmpDir, 'alignment.bin');
 
     try {
-      await runPythonWithProgress(
-        [scriptPath, audioPath, textPath, outputPath, language, modelSize],
-        { timeout: 900000, onProgress }
-      );
-
-      const timestamps = JSON.parse(
-        await fs.readFile(outputPath, 'utf-8')
-      );
-
-      return timestamps;
+      const result = await runWorkerJob({
+        audio: audioPath,
+        text: textPath,
+        output: outputPath,
+        language,
+        model_size: modelSize,
+        format: 'bin',
+        workers: TRANSCRIBE_WORKERS,
+        align_only: alignOnly,
+        cache: cachePath(cacheDir),
+      }, onProgress);
+      console.log('WhisperX result:', JSON.stringify(result));
+
+      return await readBinaryAlignment(outputPath, words);
     } catch (err) {
       console.error('WhisperX alignment failed:', err.message);
       throw new Error('WhisperX forced alignment failed: ' + err.message);
@@ -275,6 +230,56 @@ class WhisperXAligner {
     }
   }
 
+  /**
+   * Incremental re-alignment after a text edit: only the audio around words
+   * that changed since `previousSyncData` (the chapter's stored syncData) is
+   * aligned again; every other word keeps its previous timing. Much faster
+   * than alignWords, but only valid while the audio is unchanged.
+   * When most of the text changed the worker runs a full alignment instead
+   * (honouring alignOnly). Resolves with { timestamps, incremental }, where
+   * incremental is false in that case.
+   */
+  async realignWords(audioPath, previousSyncData, words, options = {}) {
+    const { language = 'en', modelSize = 'base', onProgress, cacheDir, alignOnly = false } = options;
+
+    const tmpDir = path.join(os.tmpdir(), `whisperx_re_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`);
+    await fs.mkdir(tmpDir, { recursive: true });
+
+    const textPath = path.join(tmpDir, 'words.txt');
+    const previousPath = path.join(tmpDir, 'previous.json');
+    await fs.writeFile(textPath, words.join('\n'));
+    await fs.writeFile(previousPath, JSON.stringify(previousSyncData.map(entry => ({
+      word: entry.word,
+      start: entry.clipBegin ?? null,
+      end: entry.clipEnd ?? null,
+    }))));
+
+    const outputPath = path.join(tmpDir, 'alignment.bin');
+
+    try {
+      const result = await runWorkerJob({
+        audio: audioPath,
+        text: textPath,
+        output: outputPath,
+        previous: previousPath,
+        language,
+        model_size: modelSize,
+        format: 'bin',
+        align_only: alignOnly,
+        cache: cachePath(cacheDir),
+      }, onProgress);
+      console.log('WhisperX re-alignment result:', JSON.stringify(result));
+
+      const timestamps = await readBinaryAlignment(outputPath, words);
+      return { timestamps, incremental: result.incremental === true };
+    } catch (err) {
+      console.error('WhisperX re-alignment failed:', err.message);
+      throw new Error('WhisperX re-alignment failed: ' + err.message);
+    } finally {
+      await fs.rm(tmpDir, { recursive: true, force: true });
+    }
+  }
+
   /**
    * Close timing gaps between consecutive words so highlighting is
    * continuous. Each word's clipEnd is extended to the next word's
@@ -311,7 +316,7 @@ class WhisperXAligner {
    * Particularly effective for TTS-generated audio where edge-TTS timing drifts.
    */
   async alignWithStableTs(audioPath, words, options = {}) {
-    const { language = 'en', modelSize = 'base', onProgress } = options;
+    const { language = 'en', modelSize = 'base', onProgress, cacheDir } = options;
 
     const tmpDir = path.join(os.tmpdir(), 'stable_ts_' + Date.now());
     await fs.mkdir(tmpDir, { recursive: true });
@@ -319,23 +324,18 @@ class WhisperXAligner {
     const textPath = path.join(tmpDir, 'words.txt');
     await fs.writeFile(textPath, words.join('\n'));
 
-    const outputPath = path.join(tmpDir, 'alignment.json');
+    const outputPath = path.join(tmpDir, 'alignment.bin');
 
     const scriptPath = path.join(
       __dirname, '..', 'scripts', 'stable_ts_align.py'
     );
 
     try {
-      await runPythonWithProgress(
-        [scriptPath, audioPath, textPath, outputPath, language, modelSize],
-        { timeout: 900000, onProgress }
-      );
+      const args = [scriptPath, audioPath, textPath, outputPath, language, modelSize, '--format', 'bin'];
+      if (cacheDir) args.push('--cache', cachePath(cacheDir));
+      await runPythonWithProgress(args, { timeout: 900000, onProgress });
 
-      const timestamps = JSON.parse(
-        await fs.readFile(outputPath, 'utf-8')
-      );
-
-      return timestamps;
+      return await readBinaryAlignment(outputPath, words);
     } catch (err) {
       console.error('stable-ts alignment failed:', err.message);
       throw new Error('stable-ts forced alignment failed: ' + err.message);
@@ -345,13 +345,14 @@ class WhisperXAligner {
   }
 
   /**
-   * Sentence-level alignment with even word distribution.
-   * Fallback for uploaded (non-TTS) audio.
+   * Sentence-level alignment: the text is split into sentences, aligned
+   * word by word in one worker pass, and each sentence spans its words.
+   * Fallback for uploaded (non-TTS) audio. Runs on the alignment worker.
    */
   async alignSentencesThenDistribute(audioPath, plainText, wordIds, options = {}) {
-    const { language = 'en', modelSize = 'base', onProgress } = options;
+    const { language = 'en', modelSize = 'base', onProgress, cacheDir, alignOnly = false } = options;
 
-    const tmpDir = path.join(os.tmpdir(), 'whisperx_sent_' + Date.now());
+    const tmpDir = path.join(os.tmpdir(), `whisperx_sent_${Date.now()}_${Math.random().toString(36).slice(2, 8)}`);
     await fs.mkdir(tmpDir, { recursive: true });
 
     const sentences = plainText
@@ -359,46 +360,56 @@ class WhisperXAligner {
       .split('\n')
       .filter(s => s.trim());
 
-    const textPath = path.join(tmpDir, 'sentences.txt');
-    await fs.writeFile(textPath, sentences.join('\n'));
+    // Words are aligned in sentence order, one line each, as Python splits them
+    const words = sentences.flatMap(s => s.split(/\s+/).filter(Boolean));
 
-    const outputPath = path.join(tmpDir, 'sentences.json');
-    const scriptPath = path.join(
-      __dirname, '..', 'scripts', 'whisperx_align_sentences.py'
-    );
+    const textPath = path.join(tmpDir, 'words.txt');
+    const sentencesPath = path.join(tmpDir, 'sentences.txt');
+    await fs.writeFile(textPath, words.join('\n'));
+    await fs.writeFile(sentencesPath, sentences.join('\n'));
 
-    try {
-      await runPythonWithProgress(
-        [scriptPath, audioPath, textPath, outputPath, language, modelSize],
-        { timeout: 900000, onProgress }
-      );
+    const outputPath = path.join(tmpDir, 'alignment.bin');
+    const sentenceOutputPath = path.join(tmpDir, 'sentences.json');
 
+    try {
+      // Same worker and transcription cache as alignWords, so switching
+      // modes on a chapter never transcribes it twice
+      await runWorkerJob({
+        audio: audioPath,
+        text: textPath,
+        output: outputPath,
+        language,
+        model_size: modelSize,
+        format: 'bin',
+        mode: 'both',
+        sentences: sentencesPath,
+        sentence_output: sentenceOutputPath,
+        workers: TRANSCRIBE_WORKERS,
+        align_only: alignOnly,
+        cache: cachePath(cacheDir),
+      }, onProgress);
+
+      const wordTimestamps = await readBinaryAlignment(outputPath, words);
       const sentenceTimestamps = JSON.parse(
-        await fs.readFile(outputPath, 'utf-8')
+        await fs.readFile(sentenceOutputPath, 'utf-8')
       );
 
-      // Distribute word timestamps proportionally by character length.
-      // Longer words take longer to pronounce, so they get more time.
+      // Sentences span their aligned words; keep every word inside its
+      // sentence so highlighting never runs ahead of the sentence
       const syncData = [];
       let globalWordIdx = 0;
 
       for (const sent of sentenceTimestamps) {
         const sentWords = sent.text.split(/\s+/).filter(Boolean);
-        const sentDuration = sent.end - sent.start;
-        // Weight by character count (min 1 to avoid zero-length words)
-        const charCounts = sentWords.map(w => Math.max(w.length, 1));
-        const totalChars = charCounts.reduce((a, b) => a + b, 0) || 1;
-
-        let cursor = sent.start;
-        for (let i = 0; i < sentWords.length; i++) {
-          const wordDuration = sentDuration * (charCounts[i] / totalChars);
+        for (const word of sentWords) {
+          const ts = wordTimestamps[globalWordIdx];
+          const clipBegin = Math.min(Math.max(ts.start, sent.start), sent.end);
           syncData.push({
             id: wordIds[globalWordIdx] || 'w' + String(globalWordIdx + 1).padStart(5, '0'),
-            word: sentWords[i],
-            clipBegin: Math.round(cursor * 1000) / 1000,
-            clipEnd: Math.round((cursor + wordDuration) * 1000) / 1000,
+            word,
+            clipBegin,
+            clipEnd: Math.min(Math.max(ts.end, clipBegin), sent.end),
           });
-          cursor += wordDuration;
           globalWordIdx++;
         }
       }